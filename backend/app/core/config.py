@@ -13,12 +13,23 @@ class Settings(BaseSettings):
     POSTGRES_PORT: int = 5433
 
     # AI Services
-    VOYAGE_API_KEY: str
-    MISTRAL_API_KEY: str
+    VOYAGE_API_KEY: str = ""
+    MISTRAL_API_KEY: str = ""
     GROQ_API_KEY: str = ""
     GEMINI_API_KEY: str = ""
     LANGSMITH_API_KEY: Optional[str] = None
     LANGSMITH_PROJECT: str = "portfolio-rag"
+    LANGSMITH_ENDPOINT: str = "https://api.smith.langchain.com"
+    LANGSMITH_TRACING: bool = False  # Export des traces par requête (voir core/tracing.py)
+    # Endpoints des providers (surchargés par les tests de charge, voir tests/load)
+    VOYAGE_API_URL: str = "https://api.voyageai.com/v1/embeddings"
+    MISTRAL_API_URL: str = "https://api.mistral.ai/v1/embeddings"
+    LLM_API_BASE: Optional[str] = None  # Endpoint OpenAI-compatible unique pour tous les modèles
+    # Mode hors ligne (profilage, CI) : embeddings et réponses LLM déterministes, aucun appel réseau
+    OFFLINE_PROVIDERS: bool = False
+    OFFLINE_EMBEDDING_LATENCY_MS: float = 0.0
+    OFFLINE_LLM_LATENCY_MS: float = 0.0
+    OFFLINE_LLM_COMPLETION_TOKENS: int = 250
 
     # App Config
     ENVIRONMENT: str = os.getenv("ENVIRONMENT", "development")
@@ -34,6 +45,75 @@ class Settings(BaseSettings):
     EMBEDDING_DIMENSIONS: int = 1024
     RETRIEVAL_TOP_K: int = 10
     RETRIEVAL_SCORE_THRESHOLD: float = 0.13
+    # Backend de recherche : "pgvector" (requête SQL) | "memory" (index NumPy en mémoire)
+    RETRIEVAL_BACKEND: str = "memory"
+    VECTOR_INDEX_REFRESH_SECONDS: int = 60
+    # Mode de recherche : "vector" | "hybrid" (vectoriel + BM25/plein texte, fusion RRF)
+    RETRIEVAL_MODE: str = "hybrid"
+    RRF_K: int = 60
+    # Re-ranking MMR avant génération (λ=1 : pertinence seule, λ=0 : diversité seule)
+    MMR_ENABLED: bool = True
+    MMR_LAMBDA: float = 0.7
+    MMR_TOKEN_BUDGET: int = 1500
+    # Contexte envoyé au LLM : budget de tokens d'entrée, plafond par chunk
+    CONTEXT_TOKEN_BUDGET: int = 1500
+    CONTEXT_MAX_TOKENS_PER_CHUNK: int = 300
+    TOKENIZER_ENCODING: str = "cl100k_base"
+    # Cache des embeddings de questions (LRU mémoire + table PostgreSQL)
+    EMBEDDING_CACHE_SIZE: int = 1024
+    EMBEDDING_CACHE_TTL_SECONDS: int = 86400
+    EMBEDDING_CACHE_PERSIST: bool = True
+    # Pool HTTP partagé vers les providers d'embeddings
+    HTTP_MAX_CONNECTIONS: int = 20
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+    HTTP2_ENABLED: bool = True
+    VOYAGE_TIMEOUT_SECONDS: float = 30.0
+    MISTRAL_TIMEOUT_SECONDS: float = 30.0
+    # LLM : timeout et concurrence max par provider
+    LLM_TIMEOUT_SECONDS: float = 10.0
+    LLM_MAX_CONCURRENCY_PER_PROVIDER: int = 8
+    LLM_QUEUE_TIMEOUT_SECONDS: float = 2.0
+    # Circuit breaker par provider LLM (voir core/provider_health.py)
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 3
+    LLM_BREAKER_ERROR_RATE: float = 0.5
+    LLM_BREAKER_MIN_REQUESTS: int = 10
+    LLM_BREAKER_WINDOW: int = 20
+    LLM_BREAKER_COOLDOWN_SECONDS: int = 30
+    LLM_PROBE_INTERVAL_SECONDS: int = 15
+    LLM_LATENCY_EWMA_ALPHA: float = 0.3
+    # Hedging : requête doublée vers le provider suivant si le principal tarde
+    LLM_HEDGE_ENABLED: bool = False
+    LLM_HEDGE_QUANTILE: float = 0.9
+    LLM_HEDGE_MIN_SAMPLES: int = 10
+    LLM_HEDGE_DELAY_SECONDS: float = 3.0
+    LLM_HEDGE_MAX_PER_MINUTE: int = 10
+    # Télémétrie en écriture différée (retrieval_logs, chat_sessions, chat_messages)
+    TELEMETRY_QUEUE_SIZE: int = 1000
+    TELEMETRY_BATCH_SIZE: int = 50
+    TELEMETRY_FLUSH_INTERVAL_SECONDS: float = 1.0
+    TELEMETRY_BACKPRESSURE: bool = False
+    # Traces par requête : ligne JSON (logger app.trace), file d'export LangSmith
+    TRACE_LOG_ENABLED: bool = True
+    TRACE_EXPORT_QUEUE_SIZE: int = 500
+    # Cache sémantique des réponses (distance cosinus max entre questions)
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_MAX_DISTANCE: float = 0.05
+    ANSWER_CACHE_SIZE: int = 256
+    ANSWER_CACHE_TTL_SECONDS: int = 3600
+    # Mutualisation des questions identiques en vol (single-flight)
+    CHAT_COALESCING_ENABLED: bool = True
+    # Cache des binaires du CV (PDF + pages) : mémoire bornée en octets + disque local, ETag = sha256
+    CV_CACHE_MEMORY_MAX_BYTES: int = 64 * 1024 * 1024
+    CV_CACHE_MEMORY_ITEM_MAX_BYTES: int = 8 * 1024 * 1024  # Au-delà : servi depuis le disque ou la base
+    CV_CACHE_DIR: str = "/tmp/portfolio-cv-cache"  # "" : pas de cache disque
+    CV_CACHE_REVALIDATE_SECONDS: int = 30
+    CV_CACHE_MAX_AGE_SECONDS: int = 300
+    CV_STREAM_CHUNK_BYTES: int = 256 * 1024
+    # Warm-up au démarrage (voir services/warmup.py) : pool DB, connexions providers, imports lourds
+    WARMUP_ENABLED: bool = True
+    WARMUP_DB_CONNECTIONS: int = 4
+    WARMUP_TIMEOUT_SECONDS: float = 15.0
 
     class Config:
         # env_file = ".env"
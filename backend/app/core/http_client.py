@@ -0,0 +1,130 @@
+"""
+Clients HTTP partagés (pool de connexions) pour les providers d'embeddings.
+
+Un httpx.AsyncClient par provider, créé dans le lifespan de l'application
+et fermé à l'arrêt : les connexions TCP+TLS sont réutilisées d'une
+question à l'autre au lieu d'un handshake par appel.
+"""
+import asyncio
+import importlib.util
+from typing import Dict, List
+import httpx
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def provider_timeouts() -> Dict[str, float]:
+    """Timeout (secondes) par provider."""
+    return {
+        "voyage": settings.VOYAGE_TIMEOUT_SECONDS,
+        "mistral": settings.MISTRAL_TIMEOUT_SECONDS,
+    }
+
+
+def provider_urls() -> Dict[str, str]:
+    """Endpoint d'embeddings par provider."""
+    return {
+        "voyage": settings.VOYAGE_API_URL,
+        "mistral": settings.MISTRAL_API_URL,
+    }
+
+
+class ProviderHTTPClients:
+    """Pool de clients httpx par provider, avec compteurs de handshakes."""
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self.tcp_connects: Dict[str, int] = {}
+        self.tls_handshakes: Dict[str, int] = {}
+        self.http2 = settings.HTTP2_ENABLED and importlib.util.find_spec("h2") is not None
+
+    def _create(self, provider: str) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        )
+        timeout = provider_timeouts().get(provider, 30.0)
+        self.tcp_connects.setdefault(provider, 0)
+        self.tls_handshakes.setdefault(provider, 0)
+        return httpx.AsyncClient(
+            limits=limits,
+            timeout=httpx.Timeout(timeout, connect=min(timeout, 5.0)),
+            http2=self.http2,
+        )
+
+    async def start(self) -> None:
+        """Ouvre un client par provider connu (appelé au démarrage)."""
+        for provider in provider_timeouts():
+            if provider not in self._clients:
+                self._clients[provider] = self._create(provider)
+        logger.info(f"🌐 HTTP clients ready: {', '.join(self._clients)} (http2={self.http2})")
+
+    async def warm(self, providers: List[str]) -> None:
+        """
+        Ouvre une connexion (TCP+TLS) par provider, gardée en keep-alive pour
+        la première question. Le statut de la réponse (HEAD) est ignoré.
+        """
+        urls = provider_urls()
+        results = await asyncio.gather(*[
+            self.get(provider).head(urls[provider], extensions={"trace": self._trace(provider)})
+            for provider in providers
+        ], return_exceptions=True)
+        errors = [f"{p}: {r}" for p, r in zip(providers, results) if isinstance(r, Exception)]
+        if errors:
+            raise httpx.ConnectError("; ".join(errors))
+
+    def get(self, provider: str) -> httpx.AsyncClient:
+        """Client du provider, créé à la volée si start() n'a pas été appelé."""
+        client = self._clients.get(provider)
+        if client is None or client.is_closed:
+            client = self._clients[provider] = self._create(provider)
+        return client
+
+    def _trace(self, provider: str):
+        """Callback de trace httpcore : compte les nouvelles connexions."""
+        async def trace(event_name: str, info: Dict) -> None:
+            if event_name == "connection.connect_tcp.complete":
+                self.tcp_connects[provider] += 1
+            elif event_name == "connection.start_tls.complete":
+                self.tls_handshakes[provider] += 1
+        return trace
+
+    async def post(self, provider: str, url: str, **kwargs) -> httpx.Response:
+        """POST via le client partagé du provider."""
+        client = self.get(provider)
+        extensions = {**kwargs.pop("extensions", {}), "trace": self._trace(provider)}
+        return await client.post(url, extensions=extensions, **kwargs)
+
+    async def close(self) -> None:
+        """Ferme tous les clients (appelé à l'arrêt)."""
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+        logger.info("HTTP clients closed")
+
+    def stats(self) -> Dict:
+        """Connexions ouvertes/inactives et handshakes par provider."""
+        stats = {}
+        for provider, client in self._clients.items():
+            open_connections = idle_connections = None
+            try:
+                # Pool httpcore sous-jacent (API non publique de httpx)
+                connections = client._transport._pool.connections
+                open_connections = len(connections)
+                idle_connections = sum(1 for c in connections if c.is_idle())
+            except AttributeError:
+                pass
+            stats[provider] = {
+                "open_connections": open_connections,
+                "idle_connections": idle_connections,
+                "tcp_connects": self.tcp_connects.get(provider, 0),
+                "tls_handshakes": self.tls_handshakes.get(provider, 0),
+                "http2": self.http2,
+            }
+        return stats
+
+
+http_clients = ProviderHTTPClients()
@@ -2,19 +2,41 @@
 """
 Client LLM avec fallback automatique Mistral → Groq.
 Gère timeout, retry, calcul coûts.
+
+Appels 100% asynchrones (litellm.acompletion) : une génération ne bloque
+plus la boucle d'événements et peut être annulée (déconnexion client).
+Chaque provider est limité à LLM_MAX_CONCURRENCY_PER_PROVIDER appels
+simultanés pour qu'un provider lent ne monopolise pas le worker.
+
+litellm (l'import le plus lourd de l'API) n'est chargé qu'au premier appel,
+ou pendant le warm-up du démarrage (voir services/warmup.py).
 """
+import asyncio
 import time
-from typing import Dict, List
-import litellm
-from litellm import completion
+from collections import deque
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Callable, Deque, Dict, List, Set, Tuple
 from app.core.config import settings
+from app.core.provider_health import CLOSED, provider_health
+from app.core.offline import synthetic_answer
+from app.core.metrics import record_llm_request
+from app.core.tokenizer import count_tokens
+from app.core.tracing import annotate, traced
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Configuration LiteLLM
-litellm.set_verbose = False  # Désactiver logs verbeux en prod
-litellm.success_callback = []  # Pas de callback externe
+
+@lru_cache(maxsize=1)
+def get_litellm():
+    """Module litellm, importé et configuré une seule fois (premier appel ou warm-up)."""
+    import litellm
+    # Configuration LiteLLM
+    litellm.set_verbose = False  # Désactiver logs verbeux en prod
+    litellm.success_callback = []  # Pas de callback externe
+    return litellm
+
 
 # Pricing (USD per 1M tokens)
 PRICING = {
@@ -34,6 +56,279 @@ def calculate_cost(model: str, tokens: int) -> float:
     return (tokens * price_per_million) / 1_000_000
 
 
+class ProviderSaturatedError(Exception):
+    """Aucun slot de concurrence disponible pour ce provider."""
+
+
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def release_if_acquired(semaphore: asyncio.Semaphore) -> Callable[[asyncio.Future], None]:
+    """Callback : rend le permis si l'acquisition abandonnée a tout de même abouti."""
+    def callback(acquire: asyncio.Future) -> None:
+        if not acquire.cancelled() and acquire.exception() is None:
+            semaphore.release()
+    return callback
+
+
+@asynccontextmanager
+async def provider_slot(model: str):
+    """
+    Réserve un slot de concurrence pour le provider.
+    Lève ProviderSaturatedError si aucun slot ne se libère à temps,
+    ce qui déclenche le fallback vers le provider suivant.
+
+    L'acquisition tourne dans sa propre tâche (shield) : un timeout ou une
+    annulation qui tombe au moment où le permis est obtenu le rend au lieu
+    de le perdre (wait_for de Python < 3.12), sinon le provider resterait
+    saturé pour de bon.
+    """
+    semaphore = _semaphores.setdefault(
+        model, asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY_PER_PROVIDER)
+    )
+    acquire = asyncio.ensure_future(semaphore.acquire())
+    try:
+        await asyncio.wait_for(asyncio.shield(acquire), timeout=settings.LLM_QUEUE_TIMEOUT_SECONDS)
+    except BaseException as e:
+        acquire.add_done_callback(release_if_acquired(semaphore))
+        acquire.cancel()
+        if isinstance(e, asyncio.TimeoutError):
+            raise ProviderSaturatedError(
+                f"{model} saturated ({settings.LLM_MAX_CONCURRENCY_PER_PROVIDER} calls in flight)"
+            )
+        raise
+    try:
+        yield
+    finally:
+        semaphore.release()
+
+
+def provider_chain() -> List[Tuple[str, str]]:
+    """Liste des modèles à tenter (ordre de priorité) avec leur clé API."""
+    return [
+        ("gemini/gemini-2.5-flash", settings.GEMINI_API_KEY),
+        ("mistral/mistral-small-latest", settings.MISTRAL_API_KEY),
+        ("groq/llama-3-70b-8192", settings.GROQ_API_KEY)
+    ]
+
+
+def completion_target(model: str) -> Dict:
+    """
+    Arguments model/api_base pour litellm. Avec LLM_API_BASE, tous les
+    modèles passent par un même endpoint OpenAI-compatible (serveur
+    factice des tests de charge) ; le nom du modèle reste dans la requête.
+    """
+    if settings.LLM_API_BASE:
+        return {"model": f"openai/{model}", "api_base": settings.LLM_API_BASE}
+    return {"model": model}
+
+
+OFFLINE_PROVIDER = "offline"
+
+
+async def offline_generate(messages: List[Dict]) -> Dict:
+    """Réponse synthétique (mode OFFLINE_PROVIDERS) : même dict que generate_with_fallback."""
+    start_time = time.perf_counter()
+    if settings.OFFLINE_LLM_LATENCY_MS:
+        await asyncio.sleep(settings.OFFLINE_LLM_LATENCY_MS / 1000)
+
+    prompt = "\n".join(m["content"] for m in messages)
+    response = synthetic_answer(prompt, settings.OFFLINE_LLM_COMPLETION_TOKENS, count_tokens)
+    record_llm_request(OFFLINE_PROVIDER, "success")
+    return {
+        "response": response,
+        "tokens_used": count_tokens(prompt) + count_tokens(response),
+        "provider_used": OFFLINE_PROVIDER,
+        "latency_ms": int((time.perf_counter() - start_time) * 1000),
+        "cost": 0.0,
+        "hedged": False
+    }
+
+
+async def probe_provider(model: str, api_key: str) -> None:
+    """Requête minimale pour tester un provider dont le circuit est ouvert."""
+    await asyncio.wait_for(
+        get_litellm().acompletion(
+            **completion_target(model),
+            messages=[{"role": "user", "content": "ping"}],
+            max_tokens=1,
+            api_key=api_key,
+            timeout=settings.LLM_TIMEOUT_SECONDS
+        ),
+        timeout=settings.LLM_TIMEOUT_SECONDS
+    )
+
+
+class HedgeBudget:
+    """Nombre maximal de requêtes de couverture (hedge) par minute glissante."""
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self._fired: Deque[float] = deque()
+        self.fired = 0
+        self.denied = 0
+
+    def try_acquire(self) -> bool:
+        now = time.monotonic()
+        while self._fired and now - self._fired[0] > 60:
+            self._fired.popleft()
+        if len(self._fired) >= self.per_minute:
+            self.denied += 1
+            return False
+        self._fired.append(now)
+        self.fired += 1
+        return True
+
+
+hedge_budget = HedgeBudget(settings.LLM_HEDGE_MAX_PER_MINUTE)
+
+
+def hedge_delay(model: str) -> float:
+    """Délai avant hedge (secondes) : quantile observé du provider, sinon valeur par défaut."""
+    quantile_ms = provider_health.get(model).latency_quantile(
+        settings.LLM_HEDGE_QUANTILE, settings.LLM_HEDGE_MIN_SAMPLES
+    )
+    if quantile_ms is None:
+        return settings.LLM_HEDGE_DELAY_SECONDS
+    return quantile_ms / 1000
+
+
+@traced(kind="llm")
+async def call_provider(
+    model: str,
+    api_key: str,
+    messages: List[Dict],
+    max_tokens: int,
+    temperature: float
+) -> Dict:
+    """
+    Un appel LLM (slot de concurrence + timeout), enregistré dans provider_health.
+    """
+    annotate(model=model)
+    try:
+        start_time = time.perf_counter()
+        
+        logger.info(f"🔄 Trying {model}...")
+        
+        # Appel LiteLLM (async, annulable)
+        async with provider_slot(model):
+            response = await asyncio.wait_for(
+                get_litellm().acompletion(
+                    **completion_target(model),
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    api_key=api_key,
+                    timeout=settings.LLM_TIMEOUT_SECONDS
+                ),
+                timeout=settings.LLM_TIMEOUT_SECONDS
+            )
+        
+        latency_ms = int((time.perf_counter() - start_time) * 1000)
+        tokens_used = response.usage.total_tokens
+        cost = calculate_cost(model, tokens_used)
+        provider_health.record_success(model, latency_ms)
+        record_llm_request(model, "success")
+        annotate(tokens=tokens_used, cost=cost)
+        
+        logger.info(
+            f"✅ {model} success: {tokens_used} tokens, "
+            f"{latency_ms}ms, ${cost:.6f}"
+        )
+        return {
+            "response": response.choices[0].message.content,
+            "tokens_used": tokens_used,
+            "provider_used": model,
+            "latency_ms": latency_ms,
+            "cost": cost,
+            "hedged": False
+        }
+        
+    except (ProviderSaturatedError, asyncio.CancelledError) as e:
+        # Saturation locale ou annulation : pas une panne du provider
+        provider_health.release_probe(model)
+        record_llm_request(model, "saturated" if isinstance(e, ProviderSaturatedError) else "cancelled")
+        raise
+    except Exception as e:
+        provider_health.record_failure(model, e)
+        record_llm_request(model, "error")
+        raise
+
+
+async def call_with_hedge(
+    model: str,
+    api_key: str,
+    backups: List[Tuple[str, str]],
+    tried: Set[str],
+    messages: List[Dict],
+    max_tokens: int,
+    temperature: float
+) -> Dict:
+    """
+    Appel au provider principal ; s'il n'a pas répondu après hedge_delay,
+    même prompt envoyé au provider sain suivant (dans la limite de
+    hedge_budget). La première réponse gagne, l'autre appel est annulé.
+
+    Le coût retourné inclut les deux appels : coût réel du perdant s'il a
+    terminé, sinon ses tokens d'entrée (facturés même après annulation).
+    """
+    delay = hedge_delay(model)
+    primary = asyncio.create_task(call_provider(model, api_key, messages, max_tokens, temperature))
+    tasks = {primary: model}
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        backup = next(
+            (
+                (backup_model, backup_key) for backup_model, backup_key in backups
+                if backup_key and backup_model not in tried
+                and provider_health.get(backup_model).state == CLOSED
+            ),
+            None
+        )
+        if backup is None or not hedge_budget.try_acquire():
+            return await primary
+
+        backup_model, backup_key = backup
+        tried.add(backup_model)
+        logger.info(f"🪂 {model} slow (>{delay:.2f}s), hedging with {backup_model}")
+        hedge = asyncio.create_task(call_provider(backup_model, backup_key, messages, max_tokens, temperature))
+        tasks[hedge] = backup_model
+
+        pending = set(tasks)
+        last_error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    last_error = task.exception()
+                    logger.warning(f"❌ {tasks[task]} failed: {last_error}")
+                    continue
+
+                result = task.result()
+                loser = hedge if task is primary else primary
+                if not loser.done():
+                    loser.cancel()
+                    input_tokens = count_tokens("".join(m["content"] for m in messages))
+                    loser_cost = calculate_cost(tasks[loser], input_tokens)
+                elif not loser.cancelled() and loser.exception() is None:
+                    loser_cost = loser.result()["cost"]
+                else:
+                    loser_cost = 0.0
+
+                logger.info(f"🪂 Hedge won by {tasks[task]} (+${loser_cost:.6f} for {tasks[loser]})")
+                return {**result, "cost": result["cost"] + loser_cost, "hedged": True}
+
+        raise last_error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+@traced(kind="llm")
 async def generate_with_fallback(
     system_prompt: str,
     user_prompt: str,
@@ -43,7 +338,10 @@ async def generate_with_fallback(
     """
     Génère réponse LLM avec fallback automatique.
     
-    Stratégie: Mistral → Groq → Erreur
+    Stratégie: providers sains triés par latence observée, circuits
+    ouverts sautés (voir core/provider_health.py) → Erreur.
+    Avec LLM_HEDGE_ENABLED, un provider lent est doublé par le suivant
+    (voir call_with_hedge).
     
     Returns:
         {
@@ -51,67 +349,157 @@ async def generate_with_fallback(
             "tokens_used": int,
             "provider_used": str,
             "latency_ms": int,
-            "cost": float
+            "cost": float,
+            "hedged": bool
         }
     """
-    # Liste des modèles à tenter (ordre de priorité)
-    models = [
-        ("gemini/gemini-2.5-flash", settings.GEMINI_API_KEY),
-        ("mistral/mistral-small-latest", settings.MISTRAL_API_KEY),
-        ("groq/llama-3-70b-8192", settings.GROQ_API_KEY)
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
     ]
+
+    if settings.OFFLINE_PROVIDERS:
+        return await offline_generate(messages)
+
+    models = provider_health.order(provider_chain())
+    
+    last_error = None
+    tried: Set[str] = set()
     
+    for index, (model, api_key) in enumerate(models):
+        if model in tried:
+            continue
+        if not api_key:
+            logger.warning(f"⚠️ {model} skipped (no API key)")
+            continue
+        if not provider_health.allow(model):
+            continue
+        tried.add(model)
+            
+        try:
+            if settings.LLM_HEDGE_ENABLED:
+                return await call_with_hedge(
+                    model, api_key, models[index + 1:], tried, messages, max_tokens, temperature
+                )
+            return await call_provider(model, api_key, messages, max_tokens, temperature)
+            
+        except Exception as e:
+            logger.warning(f"❌ {model} failed: {e}")
+            last_error = e
+            continue
+    
+    # Tous les providers ont échoué
+    error_msg = f"All LLM providers failed. Last error: {last_error}"
+    logger.error(error_msg)
+    raise Exception(error_msg)
+
+
+async def stream_with_fallback(
+    system_prompt: str,
+    user_prompt: str,
+    max_tokens: int = 5000,
+    temperature: float = 0.3
+) -> AsyncIterator[Tuple[str, object]]:
+    """
+    Variante streaming de generate_with_fallback.
+
+    Le fallback vers le provider suivant n'est possible que tant qu'aucun
+    token n'a été émis ; une erreur en cours de stream est propagée.
+
+    Yields:
+        ("token", str) pour chaque fragment, puis ("result", Dict) avec le
+        même dict que generate_with_fallback (réponse complète assemblée).
+    """
     messages = [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt}
     ]
+
+    if settings.OFFLINE_PROVIDERS:
+        result = await offline_generate(messages)
+        for line in result["response"].splitlines(keepends=True):
+            yield ("token", line)
+        yield ("result", result)
+        return
     
     last_error = None
     
-    for model, api_key in models:
+    for model, api_key in provider_health.order(provider_chain()):
         if not api_key:
             logger.warning(f"⚠️ {model} skipped (no API key)")
             continue
-            
+        if not provider_health.allow(model):
+            continue
+
+        emitted = False
         try:
             start_time = time.perf_counter()
             
-            logger.info(f"🔄 Trying {model}...")
+            logger.info(f"🔄 Streaming from {model}...")
             
-            # Appel LiteLLM
-            response = completion(
-                model=model,
-                messages=messages,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                api_key=api_key,
-                timeout=10.0  # 10s timeout par provider
-            )
+            async with provider_slot(model):
+                response = await get_litellm().acompletion(
+                    **completion_target(model),
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    api_key=api_key,
+                    timeout=settings.LLM_TIMEOUT_SECONDS,
+                    stream=True
+                )
+                
+                chunks = []
+                parts = []
+                async for chunk in response:
+                    chunks.append(chunk)
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        emitted = True
+                        parts.append(delta)
+                        yield ("token", delta)
             
             latency_ms = int((time.perf_counter() - start_time) * 1000)
-            tokens_used = response.usage.total_tokens
+            # Usage recalculé à partir des chunks reçus
+            usage = get_litellm().stream_chunk_builder(chunks, messages=messages).usage
+            tokens_used = usage.total_tokens
             cost = calculate_cost(model, tokens_used)
-            
-            result = {
-                "response": response.choices[0].message.content,
-                "tokens_used": tokens_used,
-                "provider_used": model,
-                "latency_ms": latency_ms,
-                "cost": cost
-            }
+            provider_health.record_success(model, latency_ms)
+            record_llm_request(model, "success")
             
             logger.info(
-                f"✅ {model} success: {tokens_used} tokens, "
+                f"✅ {model} stream success: {tokens_used} tokens, "
                 f"{latency_ms}ms, ${cost:.6f}"
             )
-            return result
+            yield ("result", {
+                "response": "".join(parts),
+                "tokens_used": tokens_used,
+                "provider_used": model,
+                "latency_ms": latency_ms,
+                "cost": cost,
+                "hedged": False
+            })
+            return
             
+        except ProviderSaturatedError as e:
+            provider_health.release_probe(model)
+            record_llm_request(model, "saturated")
+            logger.warning(f"❌ {model} failed: {e}")
+            last_error = e
+            continue
+        except (asyncio.CancelledError, GeneratorExit):
+            provider_health.release_probe(model)
+            record_llm_request(model, "cancelled")
+            raise
         except Exception as e:
+            provider_health.record_failure(model, e)
+            record_llm_request(model, "error")
+            if emitted:
+                logger.error(f"❌ {model} failed mid-stream: {e}")
+                raise
             logger.warning(f"❌ {model} failed: {e}")
             last_error = e
             continue
     
-    # Tous les providers ont échoué
     error_msg = f"All LLM providers failed. Last error: {last_error}"
     logger.error(error_msg)
-    raise Exception(error_msg)
\ No newline at end of file
+    raise Exception(error_msg)
@@ -0,0 +1,83 @@
+"""
+Instruments Prometheus (prometheus_client) du pipeline RAG.
+
+Enregistrement en mémoire uniquement (incréments et observations sous
+verrou, quelques centaines de nanosecondes) : rien n'est calculé ni
+sérialisé avant le scrape de /metrics. Les jauges lues au moment du
+scrape (pool DB, caches, file de télémétrie) sont déclarées dans
+routers/metrics.py.
+"""
+from typing import Dict
+from prometheus_client import Counter, Histogram
+
+# Bornes adaptées à un pipeline LLM : de quelques ms (cache) à ~30 s
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30)
+
+STAGE_DURATION = Histogram(
+    "rag_stage_duration_seconds",
+    "Durée de chaque étape du pipeline RAG",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+LLM_REQUESTS = Counter(
+    "llm_requests_total",
+    "Appels aux providers LLM par issue",
+    ["provider", "outcome"],  # outcome : success | error | saturated | cancelled
+)
+
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens consommés (génération), par provider",
+    ["provider"],
+)
+
+LLM_COST = Counter(
+    "llm_cost_usd_total",
+    "Coût cumulé des générations (USD), par provider",
+    ["provider"],
+)
+
+EMBEDDING_TOKENS = Counter(
+    "embedding_tokens_total",
+    "Tokens de questions vectorisées",
+)
+
+CHAT_REQUESTS = Counter(
+    "chat_requests_total",
+    "Questions traitées par le pipeline, par origine de la réponse",
+    ["source"],  # source : llm | cache | coalesced | no_context
+)
+
+# Étapes des timings du pipeline (ms) → label du histogramme
+STAGES = {
+    "embedding_ms": "embedding",
+    "retrieval_ms": "retrieval",
+    "generation_ms": "generation",
+    "logging_ms": "logging",
+}
+
+
+def observe_timings(timings: Dict[str, int]) -> None:
+    """
+    Enregistre les durées par étape d'une requête (dict "timings" du
+    pipeline). Le pipeline n'y met que les étapes exécutées : pas de
+    génération ni de recherche à 0 pour les réponses en cache ou mutualisées.
+    """
+    for key, stage in STAGES.items():
+        if key in timings:
+            STAGE_DURATION.labels(stage).observe(timings[key] / 1000)
+
+
+def record_llm_request(provider: str, outcome: str) -> None:
+    LLM_REQUESTS.labels(provider, outcome).inc()
+
+
+def record_exchange_usage(provider: str, llm_tokens: int, llm_cost: float, embedding_tokens: int) -> None:
+    """Tokens/coût d'un échange enregistré (appelé une fois par question)."""
+    if llm_tokens:
+        LLM_TOKENS.labels(provider).inc(llm_tokens)
+    if llm_cost:
+        LLM_COST.labels(provider).inc(llm_cost)
+    if embedding_tokens:
+        EMBEDDING_TOKENS.inc(embedding_tokens)
@@ -0,0 +1,59 @@
+"""
+Providers déterministes hors ligne (OFFLINE_PROVIDERS) : aucun appel réseau.
+
+- Embeddings : somme de vecteurs pseudo-aléatoires graine = hash de chaque
+  token (mêmes tokens que la recherche lexicale), normalisée. Déterministe,
+  et deux textes partageant des mots restent proches : la recherche garde
+  un comportement réaliste.
+- Réponses LLM : texte synthétique d'une longueur en tokens donnée.
+
+Module sans dépendance à la configuration : importé aussi par
+scripts/seed_data.py (--model-embeddings offline).
+"""
+import hashlib
+from functools import lru_cache
+from typing import Callable, List
+import numpy as np
+from app.services.lexical_index import tokenize
+
+OFFLINE_EMBEDDING_MODEL = "offline/hash"
+
+SENTENCES = [
+    "Ian'ch a conçu et industrialisé des pipelines de données de bout en bout.",
+    "Il privilégie une démarche itérative : cadrage, prototype, mesure, mise en production.",
+    "Ses projets récents associent FastAPI, PostgreSQL avec pgvector et des modèles de langage.",
+    "Il documente ses choix d'architecture et suit la performance en continu.",
+    "Chaque expérience a renforcé sa pratique du travail en équipe pluridisciplinaire.",
+]
+
+
+def seed_for(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+
+
+@lru_cache(maxsize=8192)
+def token_vector(token: str, dimensions: int) -> np.ndarray:
+    vector = np.random.default_rng(seed_for(token)).standard_normal(dimensions).astype(np.float32)
+    vector.setflags(write=False)
+    return vector
+
+
+def fake_embedding(text: str, dimensions: int = 1024) -> List[float]:
+    """Vecteur normalisé déterministe pour text."""
+    tokens = tokenize(text) or [text]
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for token in tokens:
+        vector += token_vector(token, dimensions)
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm > 0 else vector).tolist()
+
+
+def synthetic_answer(seed_text: str, target_tokens: int, count_tokens: Callable[[str], int]) -> str:
+    """Réponse en puces d'environ target_tokens tokens, déterministe pour seed_text."""
+    start = seed_for(seed_text) % len(SENTENCES)
+    lines: List[str] = []
+    i = start
+    while count_tokens("\n".join(lines)) < target_tokens:
+        lines.append(f"- {SENTENCES[i % len(SENTENCES)]}")
+        i += 1
+    return "\n".join(lines)
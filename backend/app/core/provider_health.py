@@ -0,0 +1,216 @@
+"""
+Santé des providers LLM : taux d'erreur, latence EWMA, circuit breaker.
+
+Chaque appel de generate_with_fallback / stream_with_fallback est
+enregistré ici. Après LLM_BREAKER_FAILURE_THRESHOLD échecs consécutifs
+(ou un taux d'erreur trop élevé sur la fenêtre récente) le circuit du
+provider s'ouvre : il est sauté au lieu de faire attendre un timeout
+complet à chaque question. Après LLM_BREAKER_COOLDOWN_SECONDS, une seule
+requête de test (half-open) est autorisée, par le trafic ou par la tâche
+de sonde périodique ; son succès referme le circuit.
+
+Les providers disponibles sont triés par latence EWMA observée (appels
+réels uniquement : la latence d'une sonde max_tokens=1 n'est pas comptée).
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ProviderHealth:
+    """Compteurs et état du breaker d'un provider."""
+
+    def __init__(self, model: str, window: int):
+        self.model = model
+        self.state = CLOSED
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.ewma_latency_ms: Optional[float] = None
+        self.latencies: Deque[int] = deque(maxlen=window)
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+        self.requests = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def latency_quantile(self, q: float, min_samples: int) -> Optional[float]:
+        """Quantile q des latences récentes (ms), None si pas assez de mesures."""
+        if len(self.latencies) < min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        return float(ordered[min(len(ordered) - 1, int(q * len(ordered)))])
+
+    def probe_due(self, now: float) -> bool:
+        return (
+            self.state == OPEN
+            and not self.probe_in_flight
+            and now - self.opened_at >= settings.LLM_BREAKER_COOLDOWN_SECONDS
+        )
+
+    def snapshot(self) -> Dict:
+        return {
+            "state": self.state,
+            "ewma_latency_ms": round(self.ewma_latency_ms, 1) if self.ewma_latency_ms is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "consecutive_failures": self.consecutive_failures,
+            "requests": self.requests,
+            "failures": self.failures,
+            "open_for_seconds": int(time.monotonic() - self.opened_at) if self.state != CLOSED else None,
+            "last_error": self.last_error,
+        }
+
+
+class ProviderHealthRegistry:
+    """Registre des providers + tâche de sonde pour les circuits ouverts."""
+
+    def __init__(self):
+        self._providers: Dict[str, ProviderHealth] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def get(self, model: str) -> ProviderHealth:
+        health = self._providers.get(model)
+        if health is None:
+            health = self._providers[model] = ProviderHealth(model, settings.LLM_BREAKER_WINDOW)
+        return health
+
+    def order(self, chain: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """
+        Chaîne à tenter : providers fermés, ceux qui ont une latence EWMA
+        triés entre eux sur leurs rangs, ceux sans mesure gardant leur rang
+        de configuration (pas de saut en tête au démarrage à froid) ; puis
+        les providers ouverts dont la sonde est due. Les autres sont sautés.
+        """
+        now = time.monotonic()
+        closed, probing = [], []
+        for model, api_key in chain:
+            health = self.get(model)
+            if health.state == CLOSED:
+                closed.append((model, api_key))
+            elif health.probe_due(now):
+                probing.append((model, api_key))
+            else:
+                logger.warning(f"⛔ {model} skipped (circuit {health.state})")
+
+        measured_slots = [i for i, (model, _) in enumerate(closed) if self.get(model).ewma_latency_ms is not None]
+        by_latency = sorted(
+            (closed[i] for i in measured_slots),
+            key=lambda entry: self.get(entry[0]).ewma_latency_ms
+        )
+        for slot, entry in zip(measured_slots, by_latency):
+            closed[slot] = entry
+        return closed + probing
+
+    def allow(self, model: str) -> bool:
+        """
+        À appeler juste avant un appel : True si le circuit est fermé, ou
+        s'il est ouvert avec une sonde due (passe alors en half-open, une
+        seule requête de test à la fois).
+        """
+        health = self.get(model)
+        if health.state == CLOSED:
+            return True
+        if health.probe_due(time.monotonic()):
+            health.state = HALF_OPEN
+            health.probe_in_flight = True
+            logger.info(f"🩺 {model} half-open: probing")
+            return True
+        return False
+
+    def record_success(self, model: str, latency_ms: Optional[int]) -> None:
+        """latency_ms None (sonde) : succès compté sans toucher à l'EWMA ni aux quantiles."""
+        health = self.get(model)
+        health.requests += 1
+        health.outcomes.append(True)
+        health.consecutive_failures = 0
+        if latency_ms is not None:
+            health.latencies.append(latency_ms)
+            alpha = settings.LLM_LATENCY_EWMA_ALPHA
+            health.ewma_latency_ms = (
+                latency_ms if health.ewma_latency_ms is None
+                else alpha * latency_ms + (1 - alpha) * health.ewma_latency_ms
+            )
+        if health.state != CLOSED:
+            logger.info(f"✅ {model} circuit closed (probe succeeded)")
+            health.outcomes.clear()
+        health.state = CLOSED
+        health.opened_at = None
+        health.probe_in_flight = False
+
+    def record_failure(self, model: str, error: Exception) -> None:
+        health = self.get(model)
+        health.requests += 1
+        health.failures += 1
+        health.outcomes.append(False)
+        health.consecutive_failures += 1
+        health.last_error = str(error)[:200]
+        health.probe_in_flight = False
+
+        too_many_failures = health.consecutive_failures >= settings.LLM_BREAKER_FAILURE_THRESHOLD
+        error_rate_exceeded = (
+            len(health.outcomes) >= settings.LLM_BREAKER_MIN_REQUESTS
+            and health.error_rate >= settings.LLM_BREAKER_ERROR_RATE
+        )
+        if health.state == HALF_OPEN or too_many_failures or error_rate_exceeded:
+            if health.state != OPEN:
+                logger.warning(
+                    f"🔌 {model} circuit opened ({health.consecutive_failures} consecutive failures, "
+                    f"error rate {health.error_rate:.0%})"
+                )
+            health.state = OPEN
+            health.opened_at = time.monotonic()
+
+    def release_probe(self, model: str) -> None:
+        """Sonde interrompue sans verdict (annulation, saturation) : le circuit reste ouvert."""
+        health = self.get(model)
+        if health.state == HALF_OPEN:
+            health.state = OPEN
+        health.probe_in_flight = False
+
+    def start(self, probe: Callable[[str, str], Awaitable[None]], chain: Callable[[], List[Tuple[str, str]]]) -> None:
+        """Démarre la sonde périodique des circuits ouverts (appelé dans le lifespan)."""
+        self._task = asyncio.create_task(self._run(probe, chain))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self, probe: Callable[[str, str], Awaitable[None]], chain: Callable[[], List[Tuple[str, str]]]) -> None:
+        while True:
+            await asyncio.sleep(settings.LLM_PROBE_INTERVAL_SECONDS)
+            now = time.monotonic()
+            for model, api_key in chain():
+                if not api_key or not self.get(model).probe_due(now):
+                    continue
+                self.allow(model)
+                try:
+                    await probe(model, api_key)
+                    # Latence d'une requête max_tokens=1 : non représentative, pas d'EWMA
+                    self.record_success(model, None)
+                except asyncio.CancelledError:
+                    self.release_probe(model)
+                    raise
+                except Exception as e:
+                    logger.warning(f"🩺 {model} probe failed: {e}")
+                    self.record_failure(model, e)
+
+    def stats(self) -> Dict:
+        return {model: health.snapshot() for model, health in self._providers.items()}
+
+
+provider_health = ProviderHealthRegistry()
@@ -0,0 +1,71 @@
+"""
+Single-flight : mutualise les appels concurrents portant la même clé.
+
+Le premier appelant lance le travail dans une tâche indépendante ; les
+appelants suivants attendent le même résultat au lieu de le recalculer.
+La tâche est protégée (asyncio.shield) tant qu'au moins un appelant
+l'attend : la déconnexion de l'un d'eux, même le premier, n'annule pas le
+travail des autres. Quand le dernier appelant part, la tâche est annulée
+(pas de génération LLM facturée pour une réponse que personne n'attend).
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Tâches en vol indexées par clé, retirées dès qu'elles se terminent."""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.cancelled = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Exécute fn() une seule fois par clé en vol.
+
+        Returns:
+            (résultat, shared) ; shared=True si le résultat vient d'un appel
+            lancé par un autre appelant.
+        """
+        task = self._inflight.get(key)
+        shared = task is not None
+        if shared:
+            self.coalesced += 1
+            logger.info(f"🔗 Coalesced with in-flight request ({self.coalesced} total)")
+        else:
+            task = asyncio.create_task(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._release(key, t))
+            self.leaders += 1
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task), shared
+        finally:
+            self._waiters[task] -= 1
+            if self._waiters[task] == 0:
+                del self._waiters[task]
+                if not task.done():
+                    # Plus personne n'attend : les nouveaux appelants relanceront le travail
+                    self._release(key, task)
+                    task.cancel()
+                    self.cancelled += 1
+                    logger.info(f"🛑 In-flight request cancelled, no caller left ({self.cancelled} total)")
+
+    def _release(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+        }
@@ -0,0 +1,46 @@
+"""
+Comptage de tokens local.
+
+tiktoken (épinglé dans requirements.txt) est chargé une seule fois, au
+premier comptage. Au premier chargement d'un encodage, tiktoken télécharge
+son fichier BPE (HTTP, sans timeout) puis le garde dans TIKTOKEN_CACHE_DIR :
+l'image Docker le pré-télécharge au build, le comptage n'y fait alors
+aucun appel réseau. Hors de l'image, le premier comptage peut télécharger
+le fichier ; en mode OFFLINE_PROVIDERS, tiktoken n'est utilisé que si
+TIKTOKEN_CACHE_DIR est défini (encodage pré-téléchargé). Sinon, ou si
+l'encodage ne peut pas être chargé, on retombe sur une approximation à
+~4 caractères par token.
+"""
+import math
+import os
+from functools import lru_cache
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    """Encodage tiktoken (mis en cache), ou None si indisponible."""
+    if settings.OFFLINE_PROVIDERS and not os.environ.get("TIKTOKEN_CACHE_DIR"):
+        logger.info("🔢 Offline mode without TIKTOKEN_CACHE_DIR, using ~4 chars/token estimate")
+        return None
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding(settings.TOKENIZER_ENCODING)
+        logger.info(f"🔢 Tokenizer loaded: {settings.TOKENIZER_ENCODING}")
+        return encoding
+    except Exception as e:
+        logger.warning(f"⚠️ tiktoken unavailable ({e}), using ~4 chars/token estimate")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Nombre de tokens de text."""
+    if not text:
+        return 0
+    encoding = get_encoding()
+    if encoding is None:
+        return math.ceil(len(text) / 4)
+    return len(encoding.encode(text, disallowed_special=()))
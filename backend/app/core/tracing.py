@@ -0,0 +1,383 @@
+"""
+Traces par requête : request ID, spans imbriqués, en-tête Server-Timing.
+
+TraceMiddleware ouvre une trace par requête HTTP (contextvars) et pose
+X-Request-ID et Server-Timing sur la réponse. Le code instrumenté ouvre
+des spans (`with span(...)` ou `@traced(...)`) ; hors requête (scripts,
+tâches de fond), span() retourne un objet inerte sans rien enregistrer.
+
+En fin de requête, si des spans ont été ouverts, la trace est écrite en
+une ligne JSON (logger "app.trace", TRACE_LOG_ENABLED) et, avec
+LANGSMITH_TRACING + LANGSMITH_API_KEY, mise en file pour l'export
+LangSmith (tâche de fond, envoi par lots, file bornée).
+Coût sans export : quelques microsecondes par span, un json.dumps par requête.
+"""
+import asyncio
+import functools
+import json
+import re
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+import httpx
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+trace_logger = logging.getLogger("app.trace")
+
+# Étapes des timings du pipeline (ms) → métriques Server-Timing
+SERVER_TIMING_STAGES = {
+    "embedding_ms": "embed",
+    "retrieval_ms": "retrieve",
+    "generation_ms": "generate",
+    "logging_ms": "persist",
+    "coalesced_wait_ms": "coalesced",
+}
+
+# X-Request-ID entrant accepté tel quel s'il est raisonnable (sinon régénéré)
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+class Span:
+    """Étape chronométrée d'une trace (parent = span englobant)."""
+
+    __slots__ = ("trace", "index", "name", "kind", "parent", "start", "duration_ms", "attributes", "error", "_previous")
+
+    def __init__(self, trace: "Trace", name: str, kind: str, attributes: Dict):
+        self.trace = trace
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.parent: Optional[int] = None
+        self.index = -1
+        self.start = 0.0
+        self.duration_ms: Optional[float] = None
+        self.error: Optional[str] = None
+        self._previous: Optional[Span] = None
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        self._previous = _current_span.get()
+        self.parent = self._previous.index if self._previous is not None else None
+        self.index = len(self.trace.spans)
+        self.trace.spans.append(self)
+        self.start = time.perf_counter()
+        _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.duration_ms = (time.perf_counter() - self.start) * 1000
+        if exc_type is not None:
+            self.error = "cancelled" if exc_type is asyncio.CancelledError else f"{exc_type.__name__}: {exc}"
+        # set() plutôt que reset(token) : la sortie peut avoir lieu dans un autre contexte (générateurs async)
+        _current_span.set(self._previous)
+        return False
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.index,
+            "parent": self.parent,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ms": round((self.start - self.trace.start) * 1000, 2),
+            "duration_ms": round(self.duration_ms, 2) if self.duration_ms is not None else None,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class NoopSpan:
+    """Span inerte retourné hors trace."""
+
+    __slots__ = ()
+
+    def set(self, **attributes) -> None:
+        pass
+
+    def __enter__(self) -> "NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+NOOP_SPAN = NoopSpan()
+
+
+class Trace:
+    """Trace d'une requête HTTP : spans + timings du pipeline."""
+
+    __slots__ = ("request_id", "method", "path", "start", "started_at", "spans", "timings", "status")
+
+    def __init__(self, request_id: str, method: str, path: str):
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.start = time.perf_counter()
+        self.started_at = time.time()
+        self.spans: List[Span] = []
+        self.timings: Dict[str, int] = {}
+        self.status: Optional[int] = None
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000
+
+    def server_timing(self) -> str:
+        """Valeur de l'en-tête Server-Timing (étapes connues + total jusqu'ici)."""
+        parts = [
+            f"{metric};dur={self.timings[key]}"
+            for key, metric in SERVER_TIMING_STAGES.items() if key in self.timings
+        ]
+        parts.append(f"total;dur={self.elapsed_ms():.1f}")
+        return ", ".join(parts)
+
+    def to_record(self) -> Dict:
+        return {
+            "request_id": self.request_id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(),
+            "duration_ms": round(self.elapsed_ms(), 2),
+            "timings": self.timings,
+            "spans": [s.to_dict() for s in self.spans],
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def span(name: str, kind: str = "chain", **attributes):
+    """
+    Context manager : span enfant du span courant (inerte hors trace).
+
+    kind (= run_type LangSmith) : chain | retriever | llm | embedding | tool
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return NOOP_SPAN
+    return Span(trace, name, kind, attributes)
+
+
+def traced(name: Optional[str] = None, kind: str = "chain"):
+    """Décorateur de coroutine : exécute la fonction dans un span."""
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span(span_name, kind):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def annotate(**attributes) -> None:
+    """Ajoute des attributs au span courant (sans effet hors trace)."""
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+def record_timings(timings: Dict[str, int]) -> None:
+    """Timings du pipeline repris dans l'en-tête Server-Timing et la trace."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.timings.update(timings)
+
+
+def current_request_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.request_id if trace is not None else None
+
+
+class LangSmithExporter:
+    """Export des traces vers LangSmith (POST /runs/batch), par lots, en tâche de fond."""
+
+    def __init__(self, endpoint: str, api_key: Optional[str], project: str, max_size: int,
+                 batch_size: int = 20, flush_interval: float = 2.0):
+        self.endpoint = endpoint.rstrip("/")
+        self.api_key = api_key
+        self.project = project
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self.exported = 0
+        self.dropped = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Démarre l'export si LANGSMITH_TRACING et une clé sont configurés (lifespan)."""
+        if not (settings.LANGSMITH_TRACING and self.api_key):
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._client = httpx.AsyncClient(timeout=10.0, headers={"x-api-key": self.api_key})
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"🛰️ LangSmith trace export enabled (project={self.project})")
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Envoie les traces en file puis arrête la tâche (appelé à l'arrêt)."""
+        if not self.enabled:
+            return
+        await self._queue.put(None)
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+        await self._client.aclose()
+
+    def submit(self, trace: Trace) -> None:
+        try:
+            self._queue.put_nowait(trace)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = loop.time() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            await self._send(batch)
+            if stop:
+                return
+
+    async def _send(self, traces: List[Trace]) -> None:
+        runs = [run for trace in traces for run in self.to_runs(trace)]
+        try:
+            response = await self._client.post(f"{self.endpoint}/runs/batch", json={"post": runs, "patch": []})
+            response.raise_for_status()
+            self.exported += len(traces)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"⚠️ LangSmith export failed ({len(traces)} traces lost): {e}")
+
+    def to_runs(self, trace: Trace) -> List[Dict]:
+        """Une run racine (la requête HTTP) + une run par span."""
+        def timestamp(offset_ms: float) -> datetime:
+            return datetime.fromtimestamp(trace.started_at + offset_ms / 1000, timezone.utc)
+
+        def run(run_id: str, parent: Optional[Dict], name: str, run_type: str, start: datetime,
+                duration_ms: float, outputs: Dict, error: Optional[str]) -> Dict:
+            order = f"{start:%Y%m%dT%H%M%S%fZ}{run_id}"
+            return {
+                "id": run_id,
+                "trace_id": root_id,
+                "parent_run_id": parent["id"] if parent else None,
+                "dotted_order": f"{parent['dotted_order']}.{order}" if parent else order,
+                "name": name,
+                "run_type": run_type,
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(milliseconds=duration_ms)).isoformat(),
+                "inputs": {},
+                "outputs": outputs,
+                "error": error,
+                "session_name": self.project,
+                "extra": {"metadata": {"request_id": trace.request_id}},
+            }
+
+        root_id = str(uuid.uuid4())
+        root = run(
+            root_id, None, f"{trace.method} {trace.path}", "chain", timestamp(0),
+            trace.elapsed_ms(), {"status": trace.status, "timings": trace.timings}, None
+        )
+        runs = [root]
+        for s in trace.spans:
+            parent = runs[s.parent + 1] if s.parent is not None else root
+            runs.append(run(
+                str(uuid.uuid4()), parent, s.name, s.kind, timestamp((s.start - trace.start) * 1000),
+                s.duration_ms or 0.0, s.attributes, s.error
+            ))
+        return runs
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+
+trace_exporter = LangSmithExporter(
+    endpoint=settings.LANGSMITH_ENDPOINT,
+    api_key=settings.LANGSMITH_API_KEY,
+    project=settings.LANGSMITH_PROJECT,
+    max_size=settings.TRACE_EXPORT_QUEUE_SIZE,
+)
+
+
+def finish_trace(trace: Trace) -> None:
+    """Fin de requête : ligne JSON + export (seulement si des spans ont été ouverts)."""
+    if not trace.spans:
+        return
+    if settings.TRACE_LOG_ENABLED and trace_logger.isEnabledFor(logging.INFO):
+        trace_logger.info(json.dumps(trace.to_record(), ensure_ascii=False, default=str))
+    if trace_exporter.enabled:
+        trace_exporter.submit(trace)
+
+
+class TraceMiddleware:
+    """
+    Middleware ASGI : une trace par requête HTTP, en-têtes X-Request-ID et
+    Server-Timing. En streaming (SSE), les en-têtes partent avant la fin du
+    pipeline : Server-Timing ne contient alors que le temps jusqu'aux en-têtes
+    (les timings complets sont dans l'événement done).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = next((v.decode("latin-1") for k, v in scope["headers"] if k == b"x-request-id"), "")
+        request_id = incoming if REQUEST_ID_PATTERN.match(incoming) else uuid.uuid4().hex
+        trace = Trace(request_id, scope["method"], scope["path"])
+        token = _current_trace.set(trace)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                trace.status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", request_id.encode("latin-1")))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current_trace.reset(token)
+            finish_trace(trace)
@@ -4,8 +4,14 @@ import logging
 
 from app.core.config import settings
 from app.core.database import init_db, close_db
+from app.core.http_client import http_clients
+from app.core.llm_client import probe_provider, provider_chain
+from app.core.provider_health import provider_health
 from app.core.security import setup_cors
-from app.routers import health, cv, chat
+from app.core.tracing import TraceMiddleware, trace_exporter
+from app.routers import health, cv, chat, metrics
+from app.services.telemetry import telemetry
+from app.services.warmup import warmup
 
 # Configure logging
 logging.basicConfig(
@@ -23,11 +29,23 @@ async def lifespan(app: FastAPI):
     if not db_connected:
         logger.error("Failed to connect to database. Exiting...")
         raise Exception("Database connection failed")
+
+    await http_clients.start()
+    telemetry.start()
+    trace_exporter.start()
+    provider_health.start(probe_provider, provider_chain)
+
+    # Avant le yield : le port n'est ouvert qu'une fois l'API chaude
+    await warmup.run()
     
     yield
     
     # Shutdown
     logger.info("Shutting down Portfolio RAG API...")
+    await provider_health.stop()
+    await telemetry.stop()
+    await trace_exporter.stop()
+    await http_clients.close()
     await close_db()
 
 
@@ -42,10 +60,14 @@ app = FastAPI(
 # Setup CORS
 setup_cors(app)
 
+# Request ID + Server-Timing + traces par requête
+app.add_middleware(TraceMiddleware)
+
 # Include routers
 app.include_router(health.router)
 app.include_router(cv.router)
 app.include_router(chat.router)
+app.include_router(metrics.router)
 
 @app.get("/")
 async def root():
@@ -2,51 +2,80 @@
 #   -H "Content-Type: application/json" \
 #   -d '{"message": "Ton expérience en ML ?"}'
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from typing import Awaitable, Dict, List
 from app.schemas.chat import ChatRequest, ChatResponse, SourceReference
-from app.services.rag import rag_pipeline
+from app.services.rag import rag_pipeline, rag_pipeline_stream
 from app.core.config import settings
+from app.core.tracing import current_request_id
+import asyncio
 import logging
-from app.core.database import AsyncSessionLocal
-from sqlalchemy import text
+import json
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
 
+def build_sources(context_chunks: List[Dict]) -> List[SourceReference]:
+    """Construire sources (top 3)."""
+    return [
+        SourceReference(
+            type=chunk['type'],
+            title=chunk['title'],
+            score=chunk['score'],
+            id=chunk['id']
+        )
+        for chunk in context_chunks[:3]
+    ]
+
+
+class ClientDisconnected(Exception):
+    """Le client a fermé la connexion avant la fin de la génération."""
+
+
+async def cancel_on_disconnect(http_request: Request, awaitable: Awaitable, poll_seconds: float = 0.5):
+    """
+    Exécute awaitable en tâche et l'annule si le client se déconnecte,
+    pour ne pas payer une génération LLM que personne ne lira.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_seconds)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                task.cancel()
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+def sse_event(event: str, data: Dict) -> str:
+    """Formate un événement Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 @router.post("/", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
     """
     Endpoint chat principal avec RAG + logging complet.
     """
     try:
-        # Appel pipeline RAG avec session_id
-        result = await rag_pipeline(
+        # Appel pipeline RAG avec session_id (annulé si le client se déconnecte)
+        result = await cancel_on_disconnect(http_request, rag_pipeline(
             question=request.message,
             session_id=request.session_id,
             top_k=settings.RETRIEVAL_TOP_K,
             score_threshold=settings.RETRIEVAL_SCORE_THRESHOLD
-        )
+        ))
         
-        # Construire sources (top 3)
-        sources = [
-            SourceReference(
-                type=chunk['type'],
-                title=chunk['title'],
-                score=chunk['score'],
-                id=chunk['id']
-            )
-            for chunk in result['context_chunks'][:3]
-        ]
-
-        # Récupérer question_count pour cette session
-        async with AsyncSessionLocal() as db:
-            result_count = await db.execute(
-                text("SELECT question_count FROM chat_sessions WHERE session_id = :sid"),
-                {"sid": request.session_id}
-            )
-            count = result_count.scalar() or 1
+        sources = build_sources(result['context_chunks'])
+        # question_count retourné par l'upsert atomique de la session
+        count = result['questions_count'] or 1
         
         return ChatResponse(
             query_id=result['query_id'],
@@ -56,9 +85,65 @@ async def chat(request: ChatRequest):
             cost=result['cost'],
             provider_used=result['provider_used'],
             questions_count=count,
-            questions_remaining=3 - count
+            questions_remaining=3 - count,
+            cached=result['cached'],
+            timings=result['timings']
         )
         
+    except ClientDisconnected:
+        logger.info(f"🔌 Client disconnected, chat cancelled (session {request.session_id})")
+        raise HTTPException(status_code=499, detail="Client disconnected")
     except Exception as e:
-        logger.error(f"Chat error: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Erreur chat: {str(e)}")
\ No newline at end of file
+        logger.error(f"Chat error [{current_request_id()}]: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Erreur chat: {str(e)}")
+
+
+@router.post("/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Variante streaming (Server-Sent Events) de l'endpoint chat.
+
+    Événements :
+      - sources : sources retenues, dès la fin de la recherche
+      - token   : fragments de la réponse au fil de la génération
+      - done    : query_id, tokens, coût, provider, compteurs de questions
+      - error   : message d'erreur (le stream s'arrête)
+    """
+    async def event_stream():
+        try:
+            async for kind, payload in rag_pipeline_stream(
+                question=request.message,
+                session_id=request.session_id,
+                top_k=settings.RETRIEVAL_TOP_K,
+                score_threshold=settings.RETRIEVAL_SCORE_THRESHOLD
+            ):
+                if kind == "sources":
+                    yield sse_event("sources", {
+                        "sources": [source.model_dump() for source in build_sources(payload)]
+                    })
+                elif kind == "token":
+                    yield sse_event("token", {"content": payload})
+                else:
+                    count = payload['questions_count'] or 1
+                    yield sse_event("done", {
+                        "query_id": payload['query_id'],
+                        "tokens_used": payload['tokens_used'],
+                        "cost": payload['cost'],
+                        "provider_used": payload['provider_used'],
+                        "questions_count": count,
+                        "questions_remaining": 3 - count,
+                        "cached": payload['cached'],
+                        "timings": payload['timings']
+                    })
+        except Exception as e:
+            logger.error(f"Chat stream error [{current_request_id()}]: {e}", exc_info=True)
+            yield sse_event("error", {"detail": f"Erreur chat: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
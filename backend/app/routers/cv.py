@@ -1,84 +1,235 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import Response
-# from app.core.database import get_db
-from app.core.database import AsyncSessionLocal
-from sqlalchemy import text
+import re
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.services.asset_cache import PDF_KEY, cv_assets
 
 router = APIRouter(prefix="/api/cv", tags=["cv"])
 
+CV_NOT_FOUND = "CV non trouvé. Utilisez upload_cv_pdf.py pour l'uploader."
+
+# range-spec d'un en-tête Range "bytes=..." (début-fin, début-, -suffixe)
+RANGE_SPEC = re.compile(r"^(\d*)-(\d*)$")
+
+# Formats des variantes de pages, par ordre de préférence (PNG d'origine en repli)
+IMAGE_FORMATS = ["avif", "webp"]
+
+# URLs par empreinte : le contenu ne change jamais, cache permanent
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match contient l'ETag (comparaison faible, RFC 9110) ou "*"."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in {tag.strip().removeprefix("W/") for tag in header.split(",")}
+
+
+def requested_range(request: Request, size: int, etag: str) -> Optional[Tuple[int, int]]:
+    """
+    Plage (début, fin inclus) demandée par l'en-tête Range, None pour tout
+    l'asset. Une seule plage est servie : plusieurs plages, range-spec
+    invalide (syntaxe, fin < début) ou If-Range périmé → asset complet
+    (RFC 9110 §14.1.1, §13.1.5). 416 si la plage n'est pas satisfiable :
+    début au-delà de la taille, ou suffixe de longueur nulle.
+    """
+    header = request.headers.get("range")
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    if_range = request.headers.get("if-range")
+    if if_range is not None and if_range.strip() != etag:
+        return None
+
+    match = RANGE_SPEC.match(header[len("bytes="):].strip())
+    if match is None or match.groups() == ("", ""):
+        return None
+    start_text, end_text = match.groups()
+    if start_text:
+        start = int(start_text)
+        if end_text and int(end_text) < start:
+            return None
+        end = min(int(end_text), size - 1) if end_text else size - 1
+        satisfiable = start < size
+    else:
+        # Suffixe : les N derniers octets
+        suffix_length = int(end_text)
+        start, end = max(size - suffix_length, 0), size - 1
+        satisfiable = suffix_length > 0 and size > 0
+    if not satisfiable:
+        raise HTTPException(
+            status_code=416,
+            detail="Plage demandée hors limites",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, end
+
+
+def accept_qualities(accept: str) -> Dict[str, float]:
+    """Media ranges de l'en-tête Accept → q (1.0 par défaut, 0 si q invalide)."""
+    qualities: Dict[str, float] = {}
+    for media_range in accept.split(","):
+        media_type, *params = [part.strip() for part in media_range.split(";")]
+        if not media_type:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        media_type = media_type.lower()
+        qualities[media_type] = max(quality, qualities.get(media_type, 0.0))
+    return qualities
+
+
+def accepted_image_formats(request: Request) -> List[str]:
+    """
+    Formats de IMAGE_FORMATS annoncés explicitement par l'en-tête Accept
+    avec q > 0, par q décroissant (ordre de IMAGE_FORMATS à égalité). Les
+    jokers (image/*, */*) ne suffisent pas : rien ne garantit que le client
+    décode AVIF ou WebP.
+    """
+    qualities = accept_qualities(request.headers.get("accept", ""))
+    accepted = [f for f in IMAGE_FORMATS if qualities.get(f"image/{f}", 0.0) > 0]
+    return sorted(accepted, key=lambda f: -qualities[f"image/{f}"])
+
+
+def asset_url(asset: Dict) -> str:
+    return f"{router.prefix}/asset/{asset['hash']}"
+
+
+def cache_headers(asset: Dict, immutable: bool = False, negotiated: bool = False) -> Dict[str, str]:
+    headers = {
+        "ETag": f'"{asset["hash"]}"',
+        "Cache-Control": (
+            IMMUTABLE_CACHE_CONTROL if immutable
+            else f"public, max-age={settings.CV_CACHE_MAX_AGE_SECONDS}"
+        ),
+    }
+    if negotiated:
+        # Réponse choisie selon Accept : URL immuable de la variante servie
+        headers["Vary"] = "Accept"
+        headers["Content-Location"] = asset_url(asset)
+    return headers
+
+
+async def serve_asset(
+    request: Request,
+    key: str,
+    not_found: str,
+    disposition: Optional[str] = None,
+    immutable: bool = False,
+    negotiated: bool = False
+) -> Response:
+    """
+    Sert un asset du CV depuis le cache (voir services/asset_cache.py) en
+    streaming par tranches, avec Range/206 ; 304 si le client a déjà cette version.
+    """
+    asset = await cv_assets.describe(key)
+    if asset is not None and etag_matches(request, cache_headers(asset)["ETag"]):
+        return Response(status_code=304, headers=cache_headers(asset, immutable, negotiated))
+
+    opened = await cv_assets.open(key)
+    if opened is None:
+        raise HTTPException(status_code=404, detail=not_found)
+    asset, reader = opened
+
+    headers = {**cache_headers(asset, immutable, negotiated), "Accept-Ranges": "bytes"}
+    if disposition:
+        headers["Content-Disposition"] = f"{disposition}; filename={asset['filename']}"
+
+    byte_range = requested_range(request, asset["size"], headers["ETag"])
+    if byte_range is None:
+        start, length, status_code = 0, asset["size"], 200
+    else:
+        start, end = byte_range
+        length, status_code = end - start + 1, 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{asset['size']}"
+    headers["Content-Length"] = str(length)
+
+    return StreamingResponse(
+        reader(start, length),
+        status_code=status_code,
+        media_type=asset["content_type"],
+        headers=headers,
+    )
+
 
 @router.get("/view")
-async def view_cv():
+async def view_cv(request: Request):
     """
     Affiche le CV PDF (inline, pour iframe).
     """
-    async with AsyncSessionLocal() as db:
-        result = await db.execute(
-            text("SELECT file_data, content_type, filename FROM cv_files LIMIT 1")
-        )
-        row = result.fetchone()
-        
-        if not row:
-            raise HTTPException(status_code=404, detail="CV non trouvé. Utilisez upload_cv_pdf.py pour l'uploader.")
-        
-        file_data, content_type, filename = row
-        
-        return Response(
-            content=bytes(file_data),
-            media_type=content_type,
-            headers={
-                "Content-Disposition": f"inline; filename={filename}"
-            }
-        )
+    return await serve_asset(request, PDF_KEY, CV_NOT_FOUND, "inline")
 
 
 @router.get("/download")
-async def download_cv():
+async def download_cv(request: Request):
     """
     Télécharge le CV PDF (attachment, pour bouton download).
     """
-    async with AsyncSessionLocal() as db:
-        result = await db.execute(
-            text("SELECT file_data, content_type, filename FROM cv_files LIMIT 1")
-        )
-        row = result.fetchone()
-        
-        if not row:
-            raise HTTPException(status_code=404, detail="CV non trouvé. Utilisez upload_cv_pdf.py pour l'uploader.")
-        
-        file_data, content_type, filename = row
-        
-        return Response(
-            content=bytes(file_data),
-            media_type=content_type,
-            headers={
-                "Content-Disposition": f"attachment; filename={filename}"
-            }
-        )
+    return await serve_asset(request, PDF_KEY, CV_NOT_FOUND, "attachment")
 
 
 @router.get("/page/{page_number}")
-async def get_cv_page_image(page_number: int):
+async def get_cv_page_image(
+    page_number: int,
+    request: Request,
+    w: Optional[int] = Query(None, ge=1, le=4096, description="Largeur d'affichage en pixels")
+):
     """
-    Retourne une page du CV en PNG (pré-générée).
+    Retourne une page du CV : variante AVIF/WebP négociée via Accept, à la
+    plus petite largeur >= w ; PNG d'origine si le client n'accepte aucun
+    des formats des variantes.
     """
-    async with AsyncSessionLocal() as db:
-        result = await db.execute(
-            text("SELECT image_data FROM cv_pages WHERE page_number = :page"),
-            {"page": page_number}
-        )
-        row = result.fetchone()
-        
-        if not row:
-            raise HTTPException(status_code=404, detail=f"Page {page_number} non trouvée")
-        
-        image_data = bytes(row[0])
-        
-        return Response(
-            content=image_data,
-            media_type="image/png",
-            headers={"Cache-Control": "public, max-age=86400"}  # Cache 24h
-        )
+    not_found = f"Page {page_number} non trouvée"
+    asset = await cv_assets.page_variant(page_number, w, accepted_image_formats(request))
+    if asset is None:
+        raise HTTPException(status_code=404, detail=not_found)
+    return await serve_asset(request, asset["key"], not_found, negotiated=True)
+
+
+@router.get("/pages")
+async def list_cv_pages(response: Response):
+    """
+    Pages du CV et leurs variantes (format, largeur, taille), avec leurs
+    URLs par empreinte pour srcset / <picture>.
+    """
+    pages: Dict[int, List[Dict]] = {}
+    for asset in (await cv_assets.manifest()).values():
+        if asset["kind"] in ("page", "variant"):
+            pages.setdefault(asset["page_number"], []).append({
+                "format": asset["format"],
+                "width": asset["width"],
+                "bytes": asset["size"],
+                "url": asset_url(asset),
+            })
+    response.headers["Cache-Control"] = f"public, max-age={settings.CV_CACHE_MAX_AGE_SECONDS}"
+    return {
+        "pages": [
+            {"page": page_number, "variants": sorted(variants, key=lambda v: (v["format"], v["width"]))}
+            for page_number, variants in sorted(pages.items())
+        ]
+    }
+
+
+@router.get("/asset/{content_hash}")
+async def get_cv_asset(content_hash: str, request: Request):
+    """
+    Asset du CV par empreinte sha256 (URL immuable, cacheable indéfiniment) ;
+    404 une fois le CV remplacé.
+    """
+    not_found = "Asset non trouvé (CV mis à jour ?)"
+    asset = await cv_assets.by_hash(content_hash)
+    if asset is None:
+        raise HTTPException(status_code=404, detail=not_found)
+    return await serve_asset(request, asset["key"], not_found, immutable=True)
 
 # Anciens endpoints (stubs pour RAG futur)
 @router.get("/skills")
@@ -102,4 +253,4 @@ async def get_projects():
 @router.get("/formations")
 async def get_formations():
     """Liste des formations (pour RAG uniquement)."""
-    return {"message": "Endpoint pour RAG - à implémenter"}
\ No newline at end of file
+    return {"message": "Endpoint pour RAG - à implémenter"}
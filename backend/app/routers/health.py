@@ -5,6 +5,15 @@ from datetime import datetime
 import logging
 
 from app.core.database import get_db
+from app.core.http_client import http_clients
+from app.core.provider_health import provider_health
+from app.core.tracing import trace_exporter
+from app.services.embedding_cache import embedding_cache
+from app.services.answer_cache import answer_cache
+from app.services.asset_cache import cv_assets
+from app.services.telemetry import telemetry
+from app.services.rag import question_flights
+from app.services.warmup import warmup
 
 router = APIRouter(prefix="/api", tags=["health"])
 logger = logging.getLogger(__name__)
@@ -34,4 +43,57 @@ async def health_check(db: AsyncSession = Depends(get_db)):
             "timestamp": datetime.utcnow().isoformat(),
             "database": "disconnected",
             "error": str(e)
-        }
\ No newline at end of file
+        }
+
+
+@router.get("/health/caches")
+async def cache_stats():
+    """
+    Compteurs hit/miss des caches applicatifs
+    """
+    return {
+        "embeddings": embedding_cache.stats(),
+        "answers": answer_cache.stats(),
+        "coalescing": question_flights.stats(),
+        "cv_assets": cv_assets.stats(),
+    }
+
+
+@router.get("/health/http-pool")
+async def http_pool_stats():
+    """
+    État du pool HTTP partagé vers les providers d'embeddings
+    """
+    return http_clients.stats()
+
+
+@router.get("/health/telemetry")
+async def telemetry_stats():
+    """
+    État de la file d'écriture différée (lignes en attente, jetées, flushs)
+    """
+    return telemetry.stats()
+
+
+@router.get("/health/tracing")
+async def tracing_stats():
+    """
+    Export LangSmith des traces (activé, en file, exportées, jetées, erreurs)
+    """
+    return trace_exporter.stats()
+
+
+@router.get("/health/providers")
+async def provider_stats():
+    """
+    État des circuit breakers LLM (état, latence EWMA, taux d'erreur)
+    """
+    return provider_health.stats()
+
+
+@router.get("/health/startup")
+async def startup_stats():
+    """
+    Warm-up du démarrage (durée et issue de chaque étape)
+    """
+    return warmup.stats()
@@ -0,0 +1,61 @@
+"""
+Endpoint Prometheus /metrics.
+
+Les histogrammes et compteurs sont alimentés dans le pipeline (voir
+core/metrics.py) ; les jauges ci-dessous sont lues au moment du scrape
+(pool SQLAlchemy, caches, file de télémétrie, circuit breakers).
+"""
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, Gauge, generate_latest
+
+from app.core.database import engine
+from app.core.provider_health import CLOSED, HALF_OPEN, provider_health
+from app.services.answer_cache import answer_cache
+from app.services.asset_cache import cv_assets
+from app.services.embedding_cache import embedding_cache
+from app.services.telemetry import telemetry
+
+router = APIRouter(tags=["metrics"])
+
+pool = engine.sync_engine.pool
+
+DB_POOL = Gauge("db_pool_connections", "Connexions du pool SQLAlchemy", ["state"])
+DB_POOL.labels("size").set_function(pool.size)
+DB_POOL.labels("checked_out").set_function(pool.checkedout)
+DB_POOL.labels("checked_in").set_function(pool.checkedin)
+DB_POOL.labels("overflow").set_function(pool.overflow)
+
+CACHE_HIT_RATIO = Gauge("cache_hit_ratio", "Taux de hit des caches applicatifs", ["cache"])
+CACHE_HIT_RATIO.labels("embeddings").set_function(lambda: embedding_cache.stats()["hit_ratio"])
+CACHE_HIT_RATIO.labels("answers").set_function(lambda: answer_cache.stats()["hit_ratio"])
+CACHE_HIT_RATIO.labels("cv_assets").set_function(lambda: cv_assets.stats()["hit_ratio"])
+
+CACHE_SIZE = Gauge("cache_entries", "Entrées des caches applicatifs (mémoire)", ["cache"])
+CACHE_SIZE.labels("embeddings").set_function(lambda: embedding_cache.stats()["size"])
+CACHE_SIZE.labels("answers").set_function(lambda: answer_cache.stats()["size"])
+CACHE_SIZE.labels("cv_assets").set_function(lambda: cv_assets.stats()["memory_entries"])
+
+TELEMETRY_QUEUE = Gauge("telemetry_queue_rows", "Lignes de télémétrie en attente d'écriture")
+TELEMETRY_QUEUE.set_function(lambda: telemetry.stats()["queued"])
+
+TELEMETRY_DROPPED = Gauge("telemetry_dropped_rows", "Lignes de télémétrie jetées (file pleine)")
+TELEMETRY_DROPPED.set_function(lambda: telemetry.dropped)
+
+BREAKER_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1}
+
+
+class BreakerStateGauge(Gauge):
+    """État des circuits LLM (0 fermé, 1 half-open, 2 ouvert), un label par provider connu."""
+
+    def collect(self):
+        for model, health in provider_health.stats().items():
+            self.labels(model).set(BREAKER_STATE_VALUES.get(health["state"], 2))
+        return super().collect()
+
+
+BreakerStateGauge("llm_circuit_state", "État du circuit breaker par provider", ["provider"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Dict
 
 
 class SourceReference(BaseModel):
@@ -25,4 +25,6 @@ class ChatResponse(BaseModel):
     cost: float  
     provider_used: str    
     questions_count: int
-    questions_remaining: int  
+    questions_remaining: int
+    cached: bool = False  # Réponse servie par le cache sémantique
+    timings: Optional[Dict[str, int]] = None  # Durées par étape (ms)  
@@ -0,0 +1,103 @@
+"""
+Cache sémantique des réponses du pipeline RAG.
+
+Une nouvelle question dont l'embedding est à moins de
+ANSWER_CACHE_MAX_DISTANCE (distance cosinus) d'une question déjà traitée
+réutilise la réponse et les sources stockées, tant que la version des
+données du CV n'a pas changé. Éviction bornée en nombre d'entrées et en âge.
+"""
+import time
+from typing import List, Dict, Optional
+import numpy as np
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AnswerCache:
+    """Entrées alignées avec une matrice d'embeddings normalisés (une ligne par entrée)."""
+
+    def __init__(self, max_entries: int, ttl_seconds: int, max_distance: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self._entries: List[Dict] = []
+        self._matrix = np.zeros((0, settings.EMBEDDING_DIMENSIONS), dtype=np.float32)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _evict(self, data_version: str) -> None:
+        """Supprime les entrées expirées ou générées sur une autre version des données."""
+        now = time.monotonic()
+        keep = [
+            i for i, entry in enumerate(self._entries)
+            if entry["data_version"] == data_version and now - entry["created_at"] <= self.ttl_seconds
+        ]
+        if len(keep) != len(self._entries):
+            self._entries = [self._entries[i] for i in keep]
+            self._matrix = self._matrix[keep]
+
+    def get(self, embedding: List[float], data_version: str) -> Optional[Dict]:
+        """Retourne la réponse en cache la plus proche, ou None."""
+        self._evict(data_version)
+        if not self._entries:
+            self.misses += 1
+            return None
+
+        scores = self._matrix @ self._normalize(embedding)
+        best = int(np.argmax(scores))
+        distance = 1.0 - float(scores[best])
+
+        if distance > self.max_distance:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        entry = self._entries[best]
+        logger.info(f"⚡ Answer cache hit (distance={distance:.4f}): \"{entry['question']}\"")
+        return entry["result"]
+
+    def put(self, question: str, embedding: List[float], data_version: str, result: Dict) -> None:
+        """
+        Stocke une réponse générée.
+
+        result: {"response", "context_chunks", "tokens_used", "cost", "provider_used"}
+        """
+        self._evict(data_version)
+        if len(self._entries) >= self.max_entries:
+            # Plus ancienne entrée en premier (ordre d'insertion)
+            overflow = len(self._entries) - self.max_entries + 1
+            self._entries = self._entries[overflow:]
+            self._matrix = self._matrix[overflow:]
+
+        self._entries.append({
+            "question": question,
+            "data_version": data_version,
+            "created_at": time.monotonic(),
+            "result": result,
+        })
+        self._matrix = np.vstack([self._matrix, self._normalize(embedding)[np.newaxis, :]])
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+answer_cache = AnswerCache(
+    max_entries=settings.ANSWER_CACHE_SIZE,
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+    max_distance=settings.ANSWER_CACHE_MAX_DISTANCE,
+)
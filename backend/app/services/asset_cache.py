@@ -0,0 +1,372 @@
+"""
+Cache des binaires du CV (PDF, pages PNG et leurs variantes WebP/AVIF)
+servis par /api/cv.
+
+Manifeste : empreinte (sha256), taille et type de chaque asset, lu par une
+requête légère (sans transférer les BYTEA) au plus toutes les
+CV_CACHE_REVALIDATE_SECONDS. L'empreinte sert d'ETag et de clé de cache :
+quand scripts/upload_cv_pdf.py remplace le CV, les empreintes changent et
+les anciennes entrées sont jetées au rechargement suivant du manifeste.
+
+Niveau 1 : LRU en mémoire borné en octets (CV_CACHE_MEMORY_MAX_BYTES),
+pour les assets d'au plus CV_CACHE_MEMORY_ITEM_MAX_BYTES.
+Niveau 2 : fichiers sur disque local nommés par empreinte (CV_CACHE_DIR),
+qui évitent de relire la base après un redémarrage du process.
+Les lectures base concurrentes d'un même asset sont mutualisées.
+
+Les octets sont servis par tranches de CV_STREAM_CHUNK_BYTES (plages
+Range incluses) : depuis la mémoire partagée, le fichier disque, ou en
+base par substring() du BYTEA. Aucune requête ne matérialise un asset
+complet pour elle seule : la mémoire par téléchargement reste constante.
+"""
+import asyncio
+import functools
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import text
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.single_flight import SingleFlight
+import logging
+
+logger = logging.getLogger(__name__)
+
+PDF_KEY = "pdf"
+
+# Empreinte calculée en SQL pour les lignes antérieures à la colonne content_hash
+MANIFEST_SQL = text("""
+    (SELECT 'pdf' AS key, 'pdf' AS kind, id,
+            coalesce(content_hash, encode(sha256(file_data), 'hex')) AS content_hash,
+            length(file_data) AS size, content_type, filename,
+            NULL::integer AS page_number, NULL::integer AS width, NULL AS format
+     FROM cv_files LIMIT 1)
+    UNION ALL
+    SELECT 'page:' || page_number, 'page', id,
+           coalesce(content_hash, encode(sha256(image_data), 'hex')),
+           length(image_data), 'image/png', NULL,
+           page_number, width, 'png'
+    FROM cv_pages
+    UNION ALL
+    SELECT 'variant:' || page_number || ':' || format || ':' || width, 'variant', id,
+           content_hash, length(image_data), 'image/' || format, NULL,
+           page_number, width, format
+    FROM cv_page_variants
+""")
+
+# Tranche [start, start + length) d'un BYTEA (substring est 1-indexé) ; aucune
+# ligne si l'asset a été remplacé. Stockage EXTERNAL (migration 008) : seuls
+# les blocs TOAST de la tranche sont lus, sans décompresser la valeur entière.
+SLICE_SQL = {
+    "pdf": text("""
+        SELECT substring(file_data FROM :start + 1 FOR :length)
+        FROM cv_files
+        WHERE id = :id AND (content_hash = :hash OR content_hash IS NULL)
+    """),
+    "page": text("""
+        SELECT substring(image_data FROM :start + 1 FOR :length)
+        FROM cv_pages
+        WHERE id = :id AND (content_hash = :hash OR content_hash IS NULL)
+    """),
+    "variant": text("""
+        SELECT substring(image_data FROM :start + 1 FOR :length)
+        FROM cv_page_variants
+        WHERE id = :id AND content_hash = :hash
+    """),
+}
+
+HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+# Lecteur d'asset : (start, length) → tranches d'octets
+Reader = Callable[[int, int], AsyncIterator[bytes]]
+
+
+class AssetChangedError(Exception):
+    """L'asset a été remplacé en base pendant sa lecture."""
+
+
+def page_key(page_number: int) -> str:
+    return f"page:{page_number}"
+
+
+def remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def read_file(path: str) -> Optional[bytes]:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+async def iter_memory(data: bytes, chunk_size: int, start: int, length: int) -> AsyncIterator[bytes]:
+    view = memoryview(data)
+    for offset in range(start, start + length, chunk_size):
+        yield bytes(view[offset:min(offset + chunk_size, start + length)])
+
+
+async def iter_file(path: str, chunk_size: int, start: int, length: int) -> AsyncIterator[bytes]:
+    f = await asyncio.to_thread(open, path, "rb")
+    try:
+        await asyncio.to_thread(f.seek, start)
+        remaining = length
+        while remaining > 0:
+            chunk = await asyncio.to_thread(f.read, min(chunk_size, remaining))
+            if not chunk:
+                raise AssetChangedError(f"{path} truncated")
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+class AssetCache:
+    """Manifeste des assets + cache mémoire (LRU en octets) + cache disque."""
+
+    def __init__(self, memory_max_bytes: int, memory_item_max_bytes: int, disk_dir: str,
+                 revalidate_seconds: int, chunk_size: int):
+        self.memory_max_bytes = memory_max_bytes
+        self.memory_item_max_bytes = min(memory_item_max_bytes, memory_max_bytes)
+        self.disk_dir = disk_dir
+        self.revalidate_seconds = revalidate_seconds
+        self.chunk_size = chunk_size
+        self._manifest: Optional[Dict[str, Dict]] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+        self._memory: OrderedDict = OrderedDict()  # empreinte → bytes
+        self._memory_bytes = 0
+        self._flights = SingleFlight()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.db_reads = 0
+        self.invalidations = 0
+
+    async def manifest(self) -> Dict[str, Dict]:
+        """Manifeste courant, relu en base au plus toutes les revalidate_seconds."""
+        if self._manifest is not None and time.monotonic() - self._checked_at <= self.revalidate_seconds:
+            return self._manifest
+        async with self._lock:
+            if self._manifest is not None and time.monotonic() - self._checked_at <= self.revalidate_seconds:
+                return self._manifest
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(MANIFEST_SQL)
+                rows = result.fetchall()
+            manifest = {
+                row.key: {
+                    "key": row.key,
+                    "kind": row.kind,
+                    "id": row.id,
+                    "hash": row.content_hash,
+                    "size": row.size,
+                    "content_type": row.content_type,
+                    "filename": row.filename,
+                    "page_number": row.page_number,
+                    "width": row.width,
+                    "format": row.format,
+                }
+                for row in rows
+            }
+            if self._manifest is not None:
+                self._drop_stale(manifest)
+            self._manifest = manifest
+            self._checked_at = time.monotonic()
+            return manifest
+
+    def expire(self) -> None:
+        """Force la relecture du manifeste à la prochaine requête."""
+        self._checked_at = 0.0
+
+    async def describe(self, key: str) -> Optional[Dict]:
+        """Métadonnées d'un asset (empreinte, taille, type) sans ses octets."""
+        return (await self.manifest()).get(key)
+
+    async def by_hash(self, content_hash: str) -> Optional[Dict]:
+        """Asset courant portant cette empreinte (URL immuable /api/cv/asset/{hash})."""
+        return next((a for a in (await self.manifest()).values() if a["hash"] == content_hash), None)
+
+    async def page_variant(self, page_number: int, width: Optional[int], formats: List[str]) -> Optional[Dict]:
+        """
+        Variante d'une page : premier format de formats (ordre de préférence)
+        disponible, plus petite largeur >= width (la plus grande sinon, ou
+        sans width). PNG d'origine si aucun format n'a de variante.
+        """
+        manifest = await self.manifest()
+        variants = [
+            a for a in manifest.values()
+            if a["kind"] == "variant" and a["page_number"] == page_number
+        ]
+        for image_format in formats:
+            candidates = sorted((a for a in variants if a["format"] == image_format), key=lambda a: a["width"])
+            if not candidates:
+                continue
+            if width is None:
+                return candidates[-1]
+            return next((a for a in candidates if a["width"] >= width), candidates[-1])
+        return manifest.get(page_key(page_number))
+
+    async def open(self, key: str) -> Optional[Tuple[Dict, Reader]]:
+        """
+        (métadonnées, lecteur) d'un asset : mémoire, puis disque, puis base.
+        None si l'asset n'existe pas.
+        """
+        for _ in range(2):
+            asset = await self.describe(key)
+            if asset is None:
+                return None
+            data = self._memory.get(asset["hash"])
+            if data is not None:
+                self._memory.move_to_end(asset["hash"])
+                self.memory_hits += 1
+                return asset, functools.partial(iter_memory, data, self.chunk_size)
+            reader, _ = await self._flights.do(asset["hash"], lambda: self._load(asset))
+            if reader is not None:
+                return asset, reader
+            # Remplacé en base depuis la lecture du manifeste : relire le manifeste
+            self.expire()
+        return None
+
+    def disk_path(self, content_hash: str) -> Optional[str]:
+        if not self.disk_dir or not HASH_PATTERN.match(content_hash):
+            return None
+        return os.path.join(self.disk_dir, content_hash)
+
+    async def _load(self, asset: Dict) -> Optional[Reader]:
+        """
+        Remplit les niveaux de cache puis retourne un lecteur ; None si
+        l'empreinte en base ne correspond plus.
+        """
+        fits_in_memory = asset["size"] <= self.memory_item_max_bytes
+        path = self.disk_path(asset["hash"])
+        if path and await asyncio.to_thread(os.path.exists, path):
+            self.disk_hits += 1
+        else:
+            self.db_reads += 1
+            if path:
+                try:
+                    if not await self._copy_to_disk(asset, path):
+                        return None
+                except OSError as e:
+                    logger.warning(f"⚠️ CV asset disk cache write failed: {e}")
+                    path = None
+
+        if path:
+            if fits_in_memory:
+                data = await asyncio.to_thread(read_file, path)
+                if data is not None:
+                    self._remember(asset["hash"], data)
+                    return functools.partial(iter_memory, data, self.chunk_size)
+            return functools.partial(iter_file, path, self.chunk_size)
+
+        # Sans cache disque : petits assets en mémoire, les autres lus en base à chaque requête
+        if fits_in_memory:
+            data = await self.read_slice(asset, 0, asset["size"])
+            if data is None:
+                return None
+            self._remember(asset["hash"], data)
+            return functools.partial(iter_memory, data, self.chunk_size)
+        return functools.partial(self.iter_db, asset)
+
+    async def read_slice(self, asset: Dict, start: int, length: int) -> Optional[bytes]:
+        """Tranche du BYTEA en base (session courte : pas de connexion tenue par un client lent)."""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(SLICE_SQL[asset["kind"]], {
+                "id": asset["id"], "hash": asset["hash"], "start": start, "length": length
+            })
+            row = result.fetchone()
+        return bytes(row[0]) if row is not None else None
+
+    async def iter_db(self, asset: Dict, start: int, length: int) -> AsyncIterator[bytes]:
+        for offset in range(start, start + length, self.chunk_size):
+            chunk = await self.read_slice(asset, offset, min(self.chunk_size, start + length - offset))
+            if chunk is None:
+                self.expire()
+                raise AssetChangedError(f"{asset['key']} replaced while streaming")
+            yield chunk
+
+    async def _copy_to_disk(self, asset: Dict, path: str) -> bool:
+        """
+        Copie base → disque par tranches, empreinte vérifiée avant de rendre
+        le fichier visible (écriture atomique, plusieurs workers).
+        """
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        digest = hashlib.sha256()
+        try:
+            await asyncio.to_thread(os.makedirs, self.disk_dir, exist_ok=True)
+            f = await asyncio.to_thread(open, tmp_path, "wb")
+            try:
+                async for chunk in self.iter_db(asset, 0, asset["size"]):
+                    digest.update(chunk)
+                    await asyncio.to_thread(f.write, chunk)
+            finally:
+                await asyncio.to_thread(f.close)
+            if digest.hexdigest() != asset["hash"]:
+                raise AssetChangedError(f"{asset['key']} hash mismatch")
+            await asyncio.to_thread(os.replace, tmp_path, path)
+            return True
+        except AssetChangedError:
+            await asyncio.to_thread(remove_file, tmp_path)
+            return False
+        except BaseException:
+            # OSError, ou annulation (plus aucun client n'attend cet asset)
+            remove_file(tmp_path)
+            raise
+
+    def _remember(self, content_hash: str, data: bytes) -> None:
+        if len(data) > self.memory_max_bytes or content_hash in self._memory:
+            return
+        self._memory[content_hash] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.memory_max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _drop_stale(self, manifest: Dict[str, Dict]) -> None:
+        """Jette (mémoire + disque) les empreintes absentes du nouveau manifeste."""
+        current = {asset["hash"] for asset in manifest.values()}
+        stale = {asset["hash"] for asset in self._manifest.values()} - current
+        if not stale:
+            return
+        self.invalidations += 1
+        logger.info(f"♻️ CV assets changed, {len(stale)} cached asset(s) invalidated")
+        for content_hash in stale:
+            data = self._memory.pop(content_hash, None)
+            if data is not None:
+                self._memory_bytes -= len(data)
+            path = self.disk_path(content_hash)
+            if path:
+                try:
+                    remove_file(path)
+                except OSError as e:
+                    logger.warning(f"⚠️ CV asset disk cache cleanup failed: {e}")
+
+    def stats(self) -> Dict:
+        lookups = self.memory_hits + self.disk_hits + self.db_reads
+        return {
+            "assets": len(self._manifest) if self._manifest is not None else None,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "memory_max_bytes": self.memory_max_bytes,
+            "disk_dir": self.disk_dir or None,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "db_reads": self.db_reads,
+            "invalidations": self.invalidations,
+            "hit_ratio": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+cv_assets = AssetCache(
+    memory_max_bytes=settings.CV_CACHE_MEMORY_MAX_BYTES,
+    memory_item_max_bytes=settings.CV_CACHE_MEMORY_ITEM_MAX_BYTES,
+    disk_dir=settings.CV_CACHE_DIR,
+    revalidate_seconds=settings.CV_CACHE_REVALIDATE_SECONDS,
+    chunk_size=settings.CV_STREAM_CHUNK_BYTES,
+)
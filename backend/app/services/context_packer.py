@@ -0,0 +1,103 @@
+"""
+Remplissage du contexte LLM sous budget de tokens.
+
+Remplace la coupe fixe à 500 caractères par chunk : les chunks (et les
+projets regroupés sous leur expérience) sont ajoutés dans l'ordre de
+classement tant que le budget d'entrée le permet, chaque description
+étant coupée en fin de phrase plutôt qu'au milieu d'un mot.
+"""
+import re
+from typing import List, Dict, Optional, Tuple
+from app.core.tokenizer import count_tokens
+import logging
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_END_RE = re.compile(r"(?<=[.!?…])\s+")
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> Tuple[str, int]:
+    """
+    Coupe text à max_tokens, en fin de phrase si possible, sinon au
+    dernier mot entier (suivi de "…").
+
+    Returns:
+        (texte coupé, nombre de tokens)
+    """
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        return text, tokens
+
+    kept: List[str] = []
+    used = 0
+    for sentence in SENTENCE_END_RE.split(text):
+        sentence_tokens = count_tokens(sentence)
+        if used + sentence_tokens > max_tokens:
+            break
+        kept.append(sentence)
+        used += sentence_tokens
+    if kept:
+        return " ".join(kept), used
+
+    # Aucune phrase complète ne tient : coupe au mot
+    words: List[str] = []
+    used = count_tokens("…")
+    for word in text.split():
+        word_tokens = count_tokens(" " + word)
+        if used + word_tokens > max_tokens:
+            break
+        words.append(word)
+        used += word_tokens
+    if not words:
+        return "", 0
+    return " ".join(words) + "…", used
+
+
+def pack_entry(chunk: Dict, remaining: int, max_tokens_per_chunk: int) -> Optional[Tuple[Dict, int]]:
+    """Un chunk (sans ses projets) coupé pour tenir dans le budget restant."""
+    header_tokens = count_tokens(f"[{chunk['type'].upper()}] {chunk['title']}")
+    room = min(remaining, max_tokens_per_chunk) - header_tokens
+    if room <= 0:
+        return None
+    description, description_tokens = trim_to_tokens(chunk.get("description") or "", room)
+    return {**chunk, "description": description}, header_tokens + description_tokens
+
+
+def pack_context(
+    chunks: List[Dict],
+    token_budget: int,
+    max_tokens_per_chunk: int
+) -> Tuple[List[Dict], int]:
+    """
+    Remplit le budget dans l'ordre des chunks (déjà triés par rang).
+
+    Un chunk trop gros pour le reste du budget est sauté, les suivants
+    (plus petits) peuvent encore entrer.
+
+    Returns:
+        (chunks retenus avec descriptions coupées, tokens de contexte)
+    """
+    packed: List[Dict] = []
+    used = 0
+
+    for chunk in chunks:
+        entry = pack_entry(chunk, token_budget - used, max_tokens_per_chunk)
+        if entry is None:
+            continue
+        packed_chunk, tokens = entry
+        used += tokens
+
+        if chunk.get("projects"):
+            projects = []
+            for project in chunk["projects"]:
+                project_entry = pack_entry(project, token_budget - used, max_tokens_per_chunk)
+                if project_entry is None:
+                    continue
+                projects.append(project_entry[0])
+                used += project_entry[1]
+            packed_chunk["projects"] = projects
+
+        packed.append(packed_chunk)
+
+    logger.info(f"📦 Context packed: {len(packed)}/{len(chunks)} chunks, {used}/{token_budget} tokens")
+    return packed, used
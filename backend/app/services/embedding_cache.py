@@ -0,0 +1,146 @@
+"""
+Cache à deux niveaux des embeddings de questions.
+
+Niveau 1 : LRU en mémoire (taille + TTL bornés).
+Niveau 2 : table PostgreSQL query_embedding_cache, qui survit aux
+redémarrages des containers serverless.
+
+La clé inclut le modèle et les dimensions : changer de modèle ne sert
+jamais un vecteur périmé.
+"""
+import asyncio
+import hashlib
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+from sqlalchemy import text
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.services.vector_index import parse_vector
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_question(question: str) -> str:
+    """Normalise une question : unicode NFKC, casse, espaces et ponctuation finale."""
+    normalized = unicodedata.normalize("NFKC", question).casefold()
+    normalized = re.sub(r"\s+", " ", normalized).strip()
+    normalized = re.sub(r"\s+([?!.,;:])", r"\1", normalized)
+    return normalized
+
+
+class EmbeddingCache:
+    """LRU mémoire + table PostgreSQL, avec compteurs hit/miss."""
+
+    def __init__(self, max_size: int, ttl_seconds: int, persist: bool):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.persist = persist
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._pending_writes: set = set()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(question: str, model: str) -> str:
+        raw = f"{model}|{settings.EMBEDDING_DIMENSIONS}|{normalize_question(question)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _get_memory(self, key: str) -> Optional[List[float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, embedding = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return embedding
+
+    def _put_memory(self, key: str, embedding: List[float]) -> None:
+        self._entries[key] = (time.monotonic(), embedding)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def _get_db(self, key: str) -> Optional[List[float]]:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                text("SELECT embedding::text FROM query_embedding_cache WHERE cache_key = :key"),
+                {"key": key}
+            )
+            value = result.scalar()
+        return parse_vector(value).tolist() if value else None
+
+    async def _put_db(self, key: str, question: str, model: str, embedding: List[float]) -> None:
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(text("""
+                    INSERT INTO query_embedding_cache (cache_key, model, dimensions, query_text, embedding)
+                    VALUES (:key, :model, :dimensions, :query_text, CAST(:embedding AS vector))
+                    ON CONFLICT (cache_key) DO NOTHING
+                """), {
+                    "key": key,
+                    "model": model,
+                    "dimensions": len(embedding),
+                    "query_text": normalize_question(question),
+                    "embedding": "[" + ",".join(map(str, embedding)) + "]",
+                })
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding cache write failed: {e}")
+
+    async def get(self, question: str, model: str) -> Optional[List[float]]:
+        """Cherche en mémoire puis en base ; None si absent des deux niveaux."""
+        key = self.make_key(question, model)
+
+        embedding = self._get_memory(key)
+        if embedding is not None:
+            self.memory_hits += 1
+            return embedding
+
+        if self.persist:
+            try:
+                embedding = await self._get_db(key)
+            except Exception as e:
+                logger.warning(f"⚠️ Embedding cache read failed: {e}")
+                embedding = None
+            if embedding is not None:
+                self.db_hits += 1
+                self._put_memory(key, embedding)
+                return embedding
+
+        self.misses += 1
+        return None
+
+    def put(self, question: str, model: str, embedding: List[float]) -> None:
+        """Stocke en mémoire et écrit en base en tâche de fond."""
+        key = self.make_key(question, model)
+        self._put_memory(key, embedding)
+
+        if self.persist:
+            task = asyncio.create_task(self._put_db(key, question, model, embedding))
+            self._pending_writes.add(task)
+            task.add_done_callback(self._pending_writes.discard)
+
+    def stats(self) -> Dict:
+        lookups = self.memory_hits + self.db_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.memory_hits + self.db_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+embedding_cache = EmbeddingCache(
+    max_size=settings.EMBEDDING_CACHE_SIZE,
+    ttl_seconds=settings.EMBEDDING_CACHE_TTL_SECONDS,
+    persist=settings.EMBEDDING_CACHE_PERSIST,
+)
@@ -1,8 +1,12 @@
+import asyncio
 import httpx
-from typing import List
+from typing import List, Tuple
 from app.core.config import settings
+from app.core.offline import OFFLINE_EMBEDDING_MODEL, fake_embedding
+from app.core.http_client import http_clients
+from app.core.tracing import annotate, traced
 import logging
-from litellm import embedding
+from app.services.embedding_cache import embedding_cache
 
 logger = logging.getLogger(__name__)
 
@@ -29,7 +33,7 @@ async def generate_embedding_mistral(query: str, model: str = "mistral-embed"):
     #     embeddings = [d["embedding"] for d in response.data][0] 
     #     logger.info(f"✅ Embedding generated: {len(embedding_vector)} dimensions")
     #     return embedding_vector
-    url = "https://api.mistral.ai/v1/embeddings"  # URL officielle de l'API Mistral
+    url = settings.MISTRAL_API_URL  # URL officielle de l'API Mistral par défaut
     headers = {
         "Authorization": f"Bearer {settings.MISTRAL_API_KEY}",  # Remplace par ta clé
         "Content-Type": "application/json"
@@ -40,13 +44,12 @@ async def generate_embedding_mistral(query: str, model: str = "mistral-embed"):
     }
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, headers=headers, json=payload, timeout=30.0)
-            response.raise_for_status()
-            data = response.json()
-            embedding = data["data"][0]["embedding"]  # Structure de la réponse Mistral
-            logger.info(f"✅ Embedding generated: {len(embedding)} dimensions")
-            return embedding
+        response = await http_clients.post("mistral", url, headers=headers, json=payload)
+        response.raise_for_status()
+        data = response.json()
+        embedding = data["data"][0]["embedding"]  # Structure de la réponse Mistral
+        logger.info(f"✅ Embedding generated: {len(embedding)} dimensions")
+        return embedding
     except httpx.HTTPStatusError as e:
         logger.error(f"❌ Erreur HTTP: {e.response.status_code} - {e.response.text}")
         raise
@@ -55,18 +58,54 @@ async def generate_embedding_mistral(query: str, model: str = "mistral-embed"):
         raise  # Ou retourne un vecteur par défaut en fallback
 
 
-async def vectorize_query(query: str, modelEmbeddings: str) -> List[float]:
+def embedding_model_name(modelEmbeddings: str) -> str:
+    """Identifiant provider/modèle utilisé dans la clé de cache."""
+    if settings.OFFLINE_PROVIDERS:
+        return OFFLINE_EMBEDDING_MODEL
+    if modelEmbeddings == "voyage":
+        return f"voyage/{settings.EMBEDDING_MODEL}"
+    return "mistral/mistral-embed"
+
+
+@traced("embed", kind="embedding")
+async def vectorize_query(query: str, modelEmbeddings: str) -> Tuple[List[float], bool]:
     """
-    Génère embedding pour une query via Voyage API.
+    Génère embedding pour une query, via le cache (mémoire puis PostgreSQL)
+    avant d'appeler l'API du provider.
     
     Args:
         query: Texte à vectoriser
         
     Returns:
-        Liste de floats (embedding vector)
+        (embedding vector, cache_hit) ; cache_hit=True : aucun appel au
+        provider, donc aucun token d'embedding facturé
+    """
+    model = embedding_model_name(modelEmbeddings)
+
+    cached = await embedding_cache.get(query, model)
+    annotate(model=model, cache_hit=cached is not None)
+    if cached is not None:
+        logger.info(f"⚡ Embedding cache hit ({model})")
+        return cached, True
+
+    embedding = await fetch_query_embedding(query, modelEmbeddings)
+    if embedding:
+        embedding_cache.put(query, model, embedding)
+    return embedding, False
+
+
+async def fetch_query_embedding(query: str, modelEmbeddings: str) -> List[float]:
     """
+    Génère embedding pour une query via Voyage API (ou Mistral), ou
+    localement en mode OFFLINE_PROVIDERS.
+    """
+    if settings.OFFLINE_PROVIDERS:
+        if settings.OFFLINE_EMBEDDING_LATENCY_MS:
+            await asyncio.sleep(settings.OFFLINE_EMBEDDING_LATENCY_MS / 1000)
+        return fake_embedding(query, settings.EMBEDDING_DIMENSIONS)
+
     if modelEmbeddings == "voyage":
-        url = "https://api.voyageai.com/v1/embeddings"
+        url = settings.VOYAGE_API_URL
         headers = {
             "Authorization": f"Bearer {settings.VOYAGE_API_KEY}",
             "Content-Type": "application/json"
@@ -79,16 +118,15 @@ async def vectorize_query(query: str, modelEmbeddings: str) -> List[float]:
 
     
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, headers=headers, json=payload, timeout=30.0)
-                response.raise_for_status()
-                data = response.json()
-                embedding = data["data"][0]["embedding"]
-                logger.info(f"✅ Embedding generated: {len(embedding)} dimensions")
-                return embedding
+            response = await http_clients.post("voyage", url, headers=headers, json=payload)
+            response.raise_for_status()
+            data = response.json()
+            embedding = data["data"][0]["embedding"]
+            logger.info(f"✅ Embedding generated: {len(embedding)} dimensions")
+            return embedding
         except Exception as e:
             logger.error(f"❌ Voyage API error: {e}")
             raise
 
     if modelEmbeddings == "mistral":
-        await generate_embedding_mistral(query)
\ No newline at end of file
+        return await generate_embedding_mistral(query)
\ No newline at end of file
@@ -0,0 +1,88 @@
+"""
+Recherche lexicale (BM25) en mémoire et fusion par reciprocal rank fusion.
+
+Complète la recherche vectorielle pour les questions à tokens exacts
+(noms de technologies, d'entreprises) que les embeddings classent mal.
+"""
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, Hashable, List, Tuple
+
+# Mots vides français fréquents dans les questions posées au chatbot
+STOPWORDS = {
+    "a", "au", "aux", "avec", "ce", "ces", "dans", "de", "des", "du", "elle", "en",
+    "est", "et", "il", "je", "la", "le", "les", "leur", "lui", "ma", "mais", "me",
+    "mes", "mon", "ne", "nos", "notre", "nous", "on", "ou", "par", "pas", "pour",
+    "qu", "que", "qui", "sa", "se", "ses", "son", "sur", "ta", "te", "tes", "toi",
+    "ton", "tu", "un", "une", "vos", "votre", "vous", "y", "quel", "quelle",
+    "quels", "quelles", "comment", "quoi", "as", "fait", "sont",
+}
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Minuscules, sans accents, mots vides et tokens d'un caractère retirés."""
+    text = unicodedata.normalize("NFKD", text or "").casefold()
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return [
+        token for token in TOKEN_RE.findall(text)
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+class LexicalIndex:
+    """Index inversé BM25 sur les textes des chunks (positions = indices de l'index vectoriel)."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._doc_lengths: List[int] = []
+        self._avg_length = 0.0
+        self._idf: Dict[str, float] = {}
+
+    def build(self, texts: List[str]) -> None:
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        doc_lengths = []
+        for doc_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings[term].append((doc_id, tf))
+
+        n_docs = len(texts)
+        self._postings = dict(postings)
+        self._doc_lengths = doc_lengths
+        self._avg_length = (sum(doc_lengths) / n_docs) if n_docs else 0.0
+        self._idf = {
+            term: math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self._postings.items()
+        }
+
+    def search(self, query: str, top_k: int) -> List[Tuple[int, float]]:
+        """Top-k (doc_id, score BM25), uniquement les documents contenant un terme."""
+        scores: Dict[int, float] = defaultdict(float)
+        avg_length = self._avg_length or 1.0
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self._postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+
+def reciprocal_rank_fusion(rankings: List[List[Hashable]], k: int = 60) -> Dict[Hashable, float]:
+    """
+    Fusionne plusieurs classements : score = Σ 1 / (k + rang), rang à partir de 1.
+    """
+    fused: Dict[Hashable, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            fused[key] += 1.0 / (k + rank)
+    return dict(fused)
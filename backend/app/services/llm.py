@@ -1,26 +1,27 @@
-from typing import List, Dict
-from app.core.llm_client import generate_with_fallback
+from typing import AsyncIterator, List, Dict, Tuple
+from app.core.llm_client import generate_with_fallback, stream_with_fallback
+from app.core.config import settings
+from app.services.context_packer import pack_context
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-async def generate_response(question: str, context_chunks: List[Dict]) -> Dict:
+def build_prompts(question: str, context_chunks: List[Dict]) -> Tuple[str, str]:
     """
-    Génère réponse via LLM (Mistral → Groq fallback) avec contexte RAG.
-    
-    Returns:
-        {
-            "response": str,
-            "tokens_used": int,
-            "provider_used": str,
-            "latency_ms": int,
-            "cost": float
-        }
+    Construit (system_prompt, user_prompt) à partir du contexte RAG.
+    Les descriptions sont rendues telles quelles : la coupe est faite en
+    amont par pack_context.
     """
-    # Construction du contexte
+    # Construction du contexte (projets listés sous leur expérience)
     context = "\n\n".join([
-        f"[{chunk['type'].upper()}] {chunk['title']}\n{chunk['description'][:500]}"
+        "\n".join([
+            f"[{chunk['type'].upper()}] {chunk['title']}\n{chunk['description']}",
+            *[
+                f"  - [PROJECT] {project['title']}\n    {project['description']}"
+                for project in chunk.get("projects", [])
+            ]
+        ])
         for chunk in context_chunks
     ])
     
@@ -48,6 +49,28 @@ Réponds en français, synthétique, percutant, simple et structurée. Mets en a
 Il faut que tu restes bien sur un raisonnement où la chronologie est très importante, il ne faut pas sauter des années car chaque année est importante pour mon parcours.
 Privilégie l'énurmation par bullets points dans la narration pour ne pas avoir un grop bloc de texte à chaque fois et que la lecture soit plus symphatique.
 N'invente rien du tout, si la question est assez éloignée du contexte propose des informations pour recentrer les questions"""
+
+    return system_prompt, user_prompt
+
+
+async def generate_response(question: str, context_chunks: List[Dict]) -> Dict:
+    """
+    Génère réponse via LLM (Mistral → Groq fallback) avec contexte RAG.
+    
+    Returns:
+        {
+            "response": str,
+            "tokens_used": int,
+            "provider_used": str,
+            "latency_ms": int,
+            "cost": float,
+            "context_tokens": int
+        }
+    """
+    packed_chunks, context_tokens = pack_context(
+        context_chunks, settings.CONTEXT_TOKEN_BUDGET, settings.CONTEXT_MAX_TOKENS_PER_CHUNK
+    )
+    system_prompt, user_prompt = build_prompts(question, packed_chunks)
     
     # Appel LLM avec fallback
     result = await generate_with_fallback(
@@ -56,5 +79,29 @@ N'invente rien du tout, si la question est assez éloignée du contexte propose
         max_tokens=5000,
         temperature=0.3
     )
+    result["context_tokens"] = context_tokens
     
-    return result
\ No newline at end of file
+    return result
+
+
+async def stream_response(question: str, context_chunks: List[Dict]) -> AsyncIterator[Tuple[str, object]]:
+    """
+    Variante streaming de generate_response.
+
+    Yields:
+        ("token", str) au fil de la génération, puis ("result", Dict).
+    """
+    packed_chunks, context_tokens = pack_context(
+        context_chunks, settings.CONTEXT_TOKEN_BUDGET, settings.CONTEXT_MAX_TOKENS_PER_CHUNK
+    )
+    system_prompt, user_prompt = build_prompts(question, packed_chunks)
+
+    async for event in stream_with_fallback(
+        system_prompt=system_prompt,
+        user_prompt=user_prompt,
+        max_tokens=5000,
+        temperature=0.3
+    ):
+        if event[0] == "result":
+            event[1]["context_tokens"] = context_tokens
+        yield event
@@ -3,10 +3,20 @@ Pipeline RAG avec logging complet des métriques.
 """
 import time
 import uuid
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from app.core.database import AsyncSessionLocal
 from app.services.embeddings import vectorize_query
-from app.services.llm import generate_response
+from app.services.embedding_cache import normalize_question
+from app.services.llm import generate_response, stream_response
+from app.services.vector_index import vector_index, current_data_version, parse_vector
+from app.services.reranker import mmr_rerank, without_embeddings
+from app.services.answer_cache import answer_cache
+from app.services.telemetry import telemetry
+from app.core.config import settings
+from app.core.tokenizer import count_tokens
+from app.core.single_flight import SingleFlight
+from app.core.metrics import CHAT_REQUESTS, observe_timings, record_exchange_usage
+from app.core.tracing import annotate, record_timings, span, traced
 from sqlalchemy import text
 import logging
 import json
@@ -16,50 +26,65 @@ logger = logging.getLogger(__name__)
 # Pricing Voyage AI
 VOYAGE_PRICE_PER_MILLION = 0.13
 
+# Questions identiques en cours de traitement (voir rag_pipeline)
+question_flights = SingleFlight()
 
-async def search_context(embedding: List[float], top_k: int = 6) -> List[Dict]:
+
+@traced(kind="retriever")
+async def search_context(
+    embedding: List[float],
+    top_k: int = 6,
+    question: str = "",
+    mode: str = "vector"
+) -> List[Dict]:
     """
-    Recherche vector similarity dans experiences + projects + formations.
+    Recherche dans rag_chunks (experiences + projets + formations + informations).
+
+    Backend choisi par settings.RETRIEVAL_BACKEND : index NumPy en mémoire
+    ("memory") ou requête pgvector ("pgvector", aussi utilisé tant que
+    l'index n'est pas chargé).
+
+    mode "hybrid" : top-k vectoriel et top-k lexical (BM25 en mémoire,
+    plein texte PostgreSQL sinon) fusionnés par reciprocal rank fusion.
     
     Returns:
-        Liste de dicts avec {type, id, title, description, score}
+        Liste de dicts avec {type, id, title, description, score, embedding}
+        (+ rrf_score, lexical_match en mode hybride)
+    """
+    hybrid = mode == "hybrid" and bool(question.strip())
+    in_memory = settings.RETRIEVAL_BACKEND == "memory" and vector_index.is_loaded
+    annotate(mode="hybrid" if hybrid else "vector", backend="memory" if in_memory else "pgvector", top_k=top_k)
+
+    if in_memory:
+        if hybrid:
+            return vector_index.search_hybrid(embedding, question, top_k, settings.RRF_K)
+        return vector_index.search(embedding, top_k)
+
+    if hybrid:
+        return await search_context_pgvector_hybrid(embedding, question, top_k)
+    return await search_context_pgvector(embedding, top_k)
+
+
+async def search_context_pgvector(embedding: List[float], top_k: int = 6) -> List[Dict]:
+    """
+    Recherche KNN directement dans PostgreSQL (index HNSW de rag_chunks).
+
+    Returns:
+        Liste de dicts avec {type, id, title, description, score, embedding}
     """
     async with AsyncSessionLocal() as db:
+        # ORDER BY sur la distance brute : l'index HNSW est utilisé
         query_sql = text("""
-            (
-                SELECT 
-                    'experience' as type,
-                    experiences.id,
-                    role as title,
-                    TO_CHAR(experiences.start_date, 'YYYY-MM-DD') || ' à ' || TO_CHAR(experiences.end_date,   'YYYY-MM-DD') || ' description : ' || context || ' ' || objective || ' ' || problem || ' ' || solution || ' ' || results || ' ' || impact || ' ' || description   as description,
-                    1 - (experiences.embedding <=> CAST(:embedding AS vector)) as score
-                FROM experiences
-                LEFT JOIN projects ON experiences.id = projects.experience_id
-                WHERE experiences.embedding IS NOT NULL 
-            )
-            UNION ALL
-            (
-                SELECT 
-                    'formation' as type,
-                    id,
-                    degree as title,
-                    TO_CHAR(start_date, 'YYYY-MM-DD') || ' à ' || TO_CHAR(end_date,   'YYYY-MM-DD') || ' description ' || description as description,
-                    1 - (embedding <=> CAST(:embedding AS vector)) as score
-                FROM formations
-                WHERE embedding IS NOT NULL
-            )
-            UNION ALL
-            (
-                SELECT 
-                    'information' as type,
-                    id,
-                    'je suis ' || prenom || ' ' || nom || ' avec le prenom prononcé ' || prononciation || ' né à ' || pays_naissance || ' le ' || TO_CHAR(date_naissance, 'YYYY-MM-DD'),
-                    'Passioné depuis par les sciences dures et les nouvelles technologies, aussi je suis ' || passion as description,
-                    1 - (embedding <=> CAST(:embedding AS vector)) as score
-                FROM informations
-                WHERE embedding IS NOT NULL
-            )
-            ORDER BY score DESC
+            SELECT
+                source_type,
+                source_id,
+                title,
+                content,
+                1 - (embedding <=> CAST(:embedding AS vector)) as score,
+                parent_id,
+                embedding::text
+            FROM rag_chunks
+            ORDER BY embedding <=> CAST(:embedding AS vector)
             LIMIT :top_k
         """)
         
@@ -67,7 +92,7 @@ async def search_context(embedding: List[float], top_k: int = 6) -> List[Dict]:
         
         result = await db.execute(
             query_sql, 
-            {"embedding": embedding_str, "top_k": 20}
+            {"embedding": embedding_str, "top_k": top_k}
         )
         rows = result.fetchall()
         
@@ -77,16 +102,180 @@ async def search_context(embedding: List[float], top_k: int = 6) -> List[Dict]:
                 "id": row[1],
                 "title": row[2],
                 "description": row[3],
-                "score": float(row[4])
+                "score": float(row[4]),
+                "parent_id": row[5],
+                "embedding": parse_vector(row[6])
             }
             for row in rows
         ]
-        for c in context_chunks:
-            print("-----------------------", c)
         
         return context_chunks
 
 
+async def search_context_pgvector_hybrid(
+    embedding: List[float],
+    question: str,
+    top_k: int = 6
+) -> List[Dict]:
+    """
+    Recherche hybride en une requête : KNN (HNSW) + plein texte (GIN sur
+    content_tsv), fusion RRF côté SQL.
+
+    Les termes de la question sont combinés en OU (plainto_tsquery les
+    combine en ET, trop strict pour une question en langage naturel).
+
+    Returns:
+        Liste de dicts avec {type, id, title, description, score, parent_id,
+        rrf_score, lexical_match, embedding}, triés par rrf_score
+    """
+    async with AsyncSessionLocal() as db:
+        query_sql = text("""
+            WITH query AS (
+                SELECT nullif(
+                    replace(plainto_tsquery('french', :question)::text, '&', '|'), ''
+                )::tsquery AS tsq
+            ),
+            vector_hits AS (
+                SELECT id, row_number() OVER (ORDER BY distance) AS rank
+                FROM (
+                    SELECT id, embedding <=> CAST(:embedding AS vector) AS distance
+                    FROM rag_chunks
+                    ORDER BY distance
+                    LIMIT :top_k
+                ) knn
+            ),
+            lexical_hits AS (
+                SELECT id, row_number() OVER (ORDER BY lex_score DESC) AS rank
+                FROM (
+                    SELECT c.id, ts_rank_cd(c.content_tsv, q.tsq) AS lex_score
+                    FROM rag_chunks c, query q
+                    WHERE c.content_tsv @@ q.tsq
+                    ORDER BY lex_score DESC
+                    LIMIT :top_k
+                ) fts
+            ),
+            fused AS (
+                SELECT id, sum(1.0 / (:rrf_k + rank)) AS rrf_score, bool_or(lexical) AS lexical_match
+                FROM (
+                    SELECT id, rank, false AS lexical FROM vector_hits
+                    UNION ALL
+                    SELECT id, rank, true AS lexical FROM lexical_hits
+                ) hits
+                GROUP BY id
+            )
+            SELECT
+                c.source_type,
+                c.source_id,
+                c.title,
+                c.content,
+                1 - (c.embedding <=> CAST(:embedding AS vector)) as score,
+                c.parent_id,
+                f.rrf_score,
+                f.lexical_match,
+                c.embedding::text
+            FROM fused f
+            JOIN rag_chunks c ON c.id = f.id
+            ORDER BY f.rrf_score DESC
+            LIMIT :top_k
+        """)
+
+        embedding_str = "[" + ",".join(map(str, embedding)) + "]"
+
+        result = await db.execute(
+            query_sql,
+            {
+                "embedding": embedding_str,
+                "question": question,
+                "top_k": top_k,
+                "rrf_k": settings.RRF_K
+            }
+        )
+        rows = result.fetchall()
+
+        return [
+            {
+                "type": row[0],
+                "id": row[1],
+                "title": row[2],
+                "description": row[3],
+                "score": float(row[4]),
+                "parent_id": row[5],
+                "rrf_score": float(row[6]),
+                "lexical_match": bool(row[7]),
+                "embedding": parse_vector(row[8])
+            }
+            for row in rows
+        ]
+
+
+async def fetch_experience_headers(experience_ids: List[int]) -> Dict[int, Dict]:
+    """
+    En-têtes (chunks 'experience') des expériences parentes non retrouvées par la recherche.
+    """
+    if vector_index.is_loaded:
+        return vector_index.lookup("experience", experience_ids)
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(text("""
+            SELECT source_id, title, content
+            FROM rag_chunks
+            WHERE source_type = 'experience' AND source_id = ANY(:ids)
+        """), {"ids": list(experience_ids)})
+        return {
+            row[0]: {"type": "experience", "id": row[0], "title": row[1], "description": row[2], "parent_id": None}
+            for row in result.fetchall()
+        }
+
+
+async def group_project_chunks(chunks: List[Dict]) -> List[Dict]:
+    """
+    Regroupe les projets sous leur expérience parente : l'en-tête de
+    l'expérience n'est envoyé qu'une fois, suivi des seuls projets retrouvés.
+
+    Returns:
+        Chunks triés par rang (rrf_score en mode hybride, score sinon) ;
+        un chunk 'experience' porte une clé "projects" (liste de chunks
+        'project') et le meilleur score du groupe.
+    """
+    retrieved_experiences = {c["id"]: c for c in chunks if c["type"] == "experience"}
+    missing_parents = {
+        c["parent_id"] for c in chunks
+        if c["type"] == "project" and c.get("parent_id") is not None
+        and c["parent_id"] not in retrieved_experiences
+    }
+    headers = await fetch_experience_headers(list(missing_parents)) if missing_parents else {}
+
+    groups: Dict[int, Dict] = {}
+    grouped: List[Dict] = []
+    for chunk in sorted(chunks, key=lambda c: c.get("rrf_score", c["score"]), reverse=True):
+        if chunk["type"] == "project" and chunk.get("parent_id") is not None:
+            experience_id = chunk["parent_id"]
+            group = groups.get(experience_id)
+            if group is None:
+                parent = retrieved_experiences.get(experience_id) or headers.get(experience_id)
+                if parent is None:
+                    grouped.append(chunk)
+                    continue
+                group = {**parent, "score": chunk["score"], "projects": []}
+                if "rrf_score" in chunk:
+                    group["rrf_score"] = chunk["rrf_score"]
+                groups[experience_id] = group
+                grouped.append(group)
+            group["projects"].append(chunk)
+        elif chunk["type"] == "experience":
+            if chunk["id"] in groups:
+                # Déjà placé via un de ses projets, mieux classé
+                continue
+            group = {**chunk, "projects": []}
+            groups[chunk["id"]] = group
+            grouped.append(group)
+        else:
+            grouped.append(chunk)
+
+    return grouped
+
+
+@traced(kind="tool")
 async def log_query_metrics(
     query_id: str,
     session_id: str,
@@ -95,7 +284,8 @@ async def log_query_metrics(
     llm_result: Dict,
     latency_retrieval_ms: int,
     latency_generation_ms: int,
-    embedding_tokens: int
+    embedding_tokens: int,
+    retrieval_method: str = "vector"
 ):
     """
     Enregistre métriques complètes dans retrieval_logs.
@@ -103,152 +293,131 @@ async def log_query_metrics(
     # Calcul coût embedding
     embedding_cost = (embedding_tokens * VOYAGE_PRICE_PER_MILLION) / 1_000_000
     
-    # Construire JSONB chunks
+    # Construire JSONB chunks (projets regroupés à plat)
     chunks_jsonb = [
         {"id": c["id"], "type": c["type"], "score": c["score"]}
-        for c in retrieved_chunks
+        for chunk in retrieved_chunks
+        for c in [chunk, *chunk.get("projects", [])]
     ]
     
     total_cost = embedding_cost + llm_result["cost"]
     latency_total_ms = latency_retrieval_ms + latency_generation_ms
     
-    async with AsyncSessionLocal() as db:
-        insert_query = text("""
-            INSERT INTO retrieval_logs (
-                query_id, session_id, query_text, retrieved_chunks,
-                retrieval_method, nb_chunks_retrieved,
-                llm_provider, embedding_tokens, llm_tokens,
-                embedding_cost, llm_cost, total_cost,
-                latency_retrieval_ms, latency_generation_ms, latency_total_ms,
-                latency_ms
-            ) VALUES (
-                :query_id, :session_id, :query_text, :retrieved_chunks,
-                :retrieval_method, :nb_chunks_retrieved,
-                :llm_provider, :embedding_tokens, :llm_tokens,
-                :embedding_cost, :llm_cost, :total_cost,
-                :latency_retrieval_ms, :latency_generation_ms, :latency_total_ms,
-                :latency_ms
-            )
-        """)
-        
-        await db.execute(insert_query, {
-            "query_id": query_id,
-            "session_id": session_id,
-            "query_text": query_text,
-            "retrieved_chunks": str(chunks_jsonb).replace("'", '"'),  # JSON string
-            "retrieval_method": "vector",
-            "nb_chunks_retrieved": len(retrieved_chunks),
-            "llm_provider": llm_result["provider_used"],
-            "embedding_tokens": embedding_tokens,
-            "llm_tokens": llm_result["tokens_used"],
-            "embedding_cost": embedding_cost,
-            "llm_cost": llm_result["cost"],
-            "total_cost": total_cost,
-            "latency_retrieval_ms": latency_retrieval_ms,
-            "latency_generation_ms": latency_generation_ms,
-            "latency_total_ms": latency_total_ms,
-            "latency_ms": latency_total_ms  # Backward compat avec ancien schema
-        })
-        await db.commit()
+    # Écriture différée (write-behind), hors du chemin critique
+    await telemetry.submit("retrieval_log", {
+        "query_id": query_id,
+        "session_id": session_id,
+        "query_text": query_text,
+        "retrieved_chunks": json.dumps(chunks_jsonb),
+        "retrieval_method": retrieval_method,
+        "nb_chunks_retrieved": len(chunks_jsonb),
+        "llm_provider": llm_result["provider_used"],
+        "embedding_tokens": embedding_tokens,
+        "llm_tokens": llm_result["tokens_used"],
+        "embedding_cost": embedding_cost,
+        "llm_cost": llm_result["cost"],
+        "total_cost": total_cost,
+        "latency_retrieval_ms": latency_retrieval_ms,
+        "latency_generation_ms": latency_generation_ms,
+        "latency_total_ms": latency_total_ms,
+        "latency_ms": latency_total_ms  # Backward compat avec ancien schema
+    })
     
     logger.info(
-        f"📊 Query logged: {query_id} | "
-        f"{len(retrieved_chunks)} chunks | "
+        f"📊 Query queued: {query_id} | "
+        f"{len(chunks_jsonb)} chunks | "
         f"{llm_result['provider_used']} | "
         f"${total_cost:.6f} | {latency_total_ms}ms"
     )
 
 
+# Upsert atomique : compteurs incrémentés, moyenne glissante et providers
+# fusionnés en JSONB dans une seule instruction (pas de read-modify-write)
+SESSION_UPSERT_SQL = text("""
+    INSERT INTO chat_sessions (session_id, question_count, total_tokens, total_cost, avg_latency_ms, providers_used)
+    VALUES (
+        :session_id, 1, :total_tokens, :total_cost, :latency_ms,
+        jsonb_build_object(CAST(:provider_used AS text), 1)
+    )
+    ON CONFLICT (session_id) DO UPDATE SET
+        question_count = chat_sessions.question_count + 1,
+        total_tokens = chat_sessions.total_tokens + EXCLUDED.total_tokens,
+        total_cost = chat_sessions.total_cost + EXCLUDED.total_cost,
+        avg_latency_ms = (
+            coalesce(chat_sessions.avg_latency_ms, 0) * chat_sessions.question_count
+            + EXCLUDED.avg_latency_ms
+        ) / (chat_sessions.question_count + 1),
+        providers_used = coalesce(chat_sessions.providers_used, '{}'::jsonb) || jsonb_build_object(
+            CAST(:provider_used AS text),
+            coalesce((chat_sessions.providers_used ->> CAST(:provider_used AS text))::int, 0) + 1
+        )
+    RETURNING question_count
+""")
+
+
+@traced(kind="tool")
 async def update_session_metrics(
     session_id: str,
     total_cost: float,
     total_tokens: int,
     latency_ms: int,
     provider_used: str
-):
+) -> int:
     """
     Met à jour les métriques agrégées de la session.
+
+    Returns:
+        Le nouveau question_count de la session.
     """
     async with AsyncSessionLocal() as db:
-        # Récupérer stats actuelles
-        select_query = text("""
-            SELECT question_count, total_tokens, total_cost, 
-                   avg_latency_ms, providers_used
-            FROM chat_sessions
-            WHERE session_id = :session_id
-        """)
-        result = await db.execute(select_query, {"session_id": session_id})
-        row = result.fetchone()
-        
-        if not row:
-            # Créer session si n'existe pas
-            insert_query = text("""
-                INSERT INTO chat_sessions (session_id, question_count, total_tokens, total_cost, avg_latency_ms, providers_used)
-                VALUES (:session_id, 1, :total_tokens, :total_cost, :latency_ms, :providers_used)
-            """)
-            providers_used = {provider_used: 1}
-            await db.execute(insert_query, {
-                "session_id": session_id,
-                "total_tokens": total_tokens,
-                "total_cost": total_cost,
-                "latency_ms": latency_ms,
-                "providers_used": str(providers_used).replace("'", '"')
-            })
-        else:
-            # Mettre à jour session existante
-            current_count, current_tokens, current_cost, current_avg_latency, providers_json = row
-            
-            new_count = current_count + 1
-            new_tokens = current_tokens + total_tokens
-            new_cost = float(current_cost) + total_cost
-            
-            # Moyenne latency
-            new_avg_latency = ((current_avg_latency * current_count) + latency_ms) // new_count
-            
-            # Incrémenter provider count
-            # providers_dict = eval(providers_json) if providers_json else {}
-            providers_dict = providers_json if providers_json else {}
-            providers_dict[provider_used] = providers_dict.get(provider_used, 0) + 1
-            
-            update_query = text("""
-                UPDATE chat_sessions
-                SET question_count = :new_count,
-                    total_tokens = :new_tokens,
-                    total_cost = :new_cost,
-                    avg_latency_ms = :new_avg_latency,
-                    providers_used = :providers_used
-                WHERE session_id = :session_id
-            """)
-            await db.execute(update_query, {
-                "session_id": session_id,
-                "new_count": new_count,
-                "new_tokens": new_tokens,
-                "new_cost": new_cost,
-                "new_avg_latency": new_avg_latency,
-                # "providers_used": str(providers_dict).replace("'", '"'),
-                "providers_used": json.dumps(providers_dict),
-            })
-        
+        result = await db.execute(SESSION_UPSERT_SQL, {
+            "session_id": session_id,
+            "total_tokens": total_tokens,
+            "total_cost": total_cost,
+            "latency_ms": latency_ms,
+            "provider_used": provider_used
+        })
+        question_count = result.scalar()
         await db.commit()
 
+    return question_count
 
-async def rag_pipeline(
+
+@traced(kind="tool")
+async def get_question_count(session_id: str) -> int:
+    """question_count actuel de la session (sans l'incrémenter)."""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            text("SELECT question_count FROM chat_sessions WHERE session_id = :sid"),
+            {"sid": session_id}
+        )
+        return result.scalar() or 0
+
+
+NO_CONTEXT_RESPONSE = "Désolé, je n'ai pas trouvé d'information pertinente dans mon CV pour répondre à cette question."
+
+
+@traced(kind="retriever")
+async def retrieve_context(
     question: str,
-    session_id: str,
     top_k: int = 6,
     score_threshold: float = 0.7
 ) -> Dict:
     """
-    Pipeline RAG complet avec logging.
-    
+    Étapes de récupération du pipeline : vectorisation, cache sémantique,
+    recherche de contexte.
+
     Returns:
         {
             "query_id": str,
-            "response": str,
+            "embedding": List[float],
+            "embedding_tokens": int,
+            "data_version": str | None,
+            "cached_result": Dict | None,
             "context_chunks": List[Dict],
-            "tokens_used": int,
-            "cost": float,
-            "provider_used": str
+            "retrieval_method": str,  # "vector" | "hybrid" | "cache"
+            "latency_retrieval_ms": int,
+            "timings": {"embedding_ms": int, "retrieval_ms": int}  # retrieval_ms absent si cache
         }
     """
     query_id = str(uuid.uuid4())
@@ -259,43 +428,132 @@ async def rag_pipeline(
     modelEmbeddings = "voyage"
     # modelEmbeddings = "mistral"
     
-    embedding = await vectorize_query(question, modelEmbeddings)
-    embedding_tokens = len(question.split())  # Approximation
-    
-    # 2. Recherche contexte
-    context_chunks = await search_context(embedding, top_k)
+    embedding, embedding_cache_hit = await vectorize_query(question, modelEmbeddings)
+    # Embedding servi par le cache : aucun appel Voyage, rien à facturer
+    embedding_tokens = 0 if embedding_cache_hit else count_tokens(question)
+    embedding_ms = int((time.perf_counter() - start_retrieval) * 1000)
+
+    # 2. Cache sémantique : question proche déjà traitée sur la même version des données
+    data_version = None
+    cached_result = None
+    if settings.ANSWER_CACHE_ENABLED:
+        data_version = await current_data_version()
+        cached_result = answer_cache.get(embedding, data_version)
+
+    if cached_result is not None:
+        filtered_chunks = cached_result["context_chunks"]
+        retrieval_method = "cache"
+    else:
+        # 3. Recherche contexte
+        retrieval_method = settings.RETRIEVAL_MODE
+        context_chunks = await search_context(embedding, top_k, question, retrieval_method)
+        
+        # Filtrer par score (un match lexical exact est gardé même sous le seuil)
+        filtered_chunks = [
+            chunk for chunk in context_chunks 
+            if chunk['score'] >= score_threshold or chunk.get('lexical_match')
+        ]
+
+        # Diversité (MMR) sous budget de tokens, avant regroupement
+        if settings.MMR_ENABLED:
+            filtered_chunks = mmr_rerank(
+                embedding, filtered_chunks, settings.MMR_LAMBDA,
+                settings.MMR_TOKEN_BUDGET, settings.CONTEXT_MAX_TOKENS_PER_CHUNK
+            )
+        else:
+            filtered_chunks = without_embeddings(filtered_chunks)
+
+        # Projets regroupés sous leur expérience (en-tête une seule fois)
+        filtered_chunks = await group_project_chunks(filtered_chunks)
+
     latency_retrieval_ms = int((time.perf_counter() - start_retrieval) * 1000)
+    annotate(query_id=query_id, retrieval_method=retrieval_method, chunks=len(filtered_chunks))
+
+    # Seules les étapes exécutées sont mesurées (pas de 0 dans les histogrammes)
+    timings = {"embedding_ms": embedding_ms}
+    if cached_result is None:
+        timings["retrieval_ms"] = latency_retrieval_ms - embedding_ms
     
-    # Filtrer par score
-    filtered_chunks = [
-        chunk for chunk in context_chunks 
-        if chunk['score'] >= score_threshold
-    ]
-    
-    if not filtered_chunks:
-        logger.warning(f"⚠️ No relevant context (threshold={score_threshold})")
-        return {
-            "query_id": query_id,
-            "response": "Désolé, je n'ai pas trouvé d'information pertinente dans mon CV pour répondre à cette question.",
-            "context_chunks": [],
-            "tokens_used": 0,
-            "cost": 0.0,
-            "provider_used": "none"
-        }
-    
-    # 3. Génération + mesure latency
-    logger.info(f"✍️ RAG Pipeline [{query_id}]: generating with {len(filtered_chunks)} chunks...")
-    start_generation = time.perf_counter()
-    
-    llm_result = await generate_response(question, filtered_chunks)
-    latency_generation_ms = int((time.perf_counter() - start_generation) * 1000)
-    
+    return {
+        "query_id": query_id,
+        "embedding": embedding,
+        "embedding_tokens": embedding_tokens,
+        "data_version": data_version,
+        "cached_result": cached_result,
+        "context_chunks": filtered_chunks,
+        "retrieval_method": retrieval_method,
+        "latency_retrieval_ms": latency_retrieval_ms,
+        "timings": timings
+    }
+
+
+def cached_llm_result(cached_result: Dict) -> Dict:
+    """Résultat LLM équivalent pour une réponse servie par le cache."""
+    return {
+        "response": cached_result["response"],
+        "tokens_used": 0,
+        "provider_used": "cache",
+        "latency_ms": 0,
+        "cost": 0.0
+    }
+
+
+def no_context_result(query_id: str, questions_count: int) -> Dict:
+    """Réponse par défaut quand aucun chunk ne dépasse le seuil."""
+    return {
+        "query_id": query_id,
+        "response": NO_CONTEXT_RESPONSE,
+        "context_chunks": [],
+        "tokens_used": 0,
+        "cost": 0.0,
+        "provider_used": "none",
+        "cached": False,
+        "questions_count": questions_count
+    }
+
+
+def store_answer(question: str, retrieval: Dict, llm_result: Dict) -> None:
+    """Alimente le cache sémantique avec une réponse fraîchement générée."""
+    if not settings.ANSWER_CACHE_ENABLED:
+        return
+    answer_cache.put(question, retrieval["embedding"], retrieval["data_version"], {
+        "response": llm_result["response"],
+        "context_chunks": retrieval["context_chunks"],
+        "tokens_used": llm_result["tokens_used"],
+        "cost": llm_result["cost"],
+        "provider_used": llm_result["provider_used"]
+    })
+
+
+@traced(kind="tool")
+async def record_exchange(
+    question: str,
+    session_id: str,
+    retrieval: Dict,
+    llm_result: Dict,
+    latency_generation_ms: int
+) -> Dict:
+    """
+    Bookkeeping après génération : session, métriques, messages.
+
+    Returns:
+        Le résultat final du pipeline (voir rag_pipeline).
+    """
+    query_id = retrieval["query_id"]
+    embedding_tokens = retrieval["embedding_tokens"]
+    latency_retrieval_ms = retrieval["latency_retrieval_ms"]
+    filtered_chunks = retrieval["context_chunks"]
+
     # 4. Update session
     total_cost = (embedding_tokens * VOYAGE_PRICE_PER_MILLION / 1_000_000) + llm_result["cost"]
     total_tokens = embedding_tokens + llm_result["tokens_used"]
     latency_total_ms = latency_retrieval_ms + latency_generation_ms
     
-    await update_session_metrics(
+    record_exchange_usage(
+        llm_result["provider_used"], llm_result["tokens_used"], llm_result["cost"], embedding_tokens
+    )
+
+    questions_count = await update_session_metrics(
         session_id=session_id,
         total_cost=total_cost,
         total_tokens=total_tokens,
@@ -312,7 +570,8 @@ async def rag_pipeline(
         llm_result=llm_result,
         latency_retrieval_ms=latency_retrieval_ms,
         latency_generation_ms=latency_generation_ms,
-        embedding_tokens=embedding_tokens
+        embedding_tokens=embedding_tokens,
+        retrieval_method=retrieval["retrieval_method"]
     )
 
     # 6. Logger les messages user/assistant
@@ -329,9 +588,215 @@ async def rag_pipeline(
         "context_chunks": filtered_chunks,
         "tokens_used": total_tokens,
         "cost": total_cost,
-        "provider_used": llm_result["provider_used"]
+        "provider_used": llm_result["provider_used"],
+        "cached": retrieval["cached_result"] is not None,
+        "questions_count": questions_count
     }
 
+
+@traced()
+async def answer_question(
+    question: str,
+    top_k: int = 6,
+    score_threshold: float = 0.7
+) -> Dict:
+    """
+    Partie mutualisable du pipeline : récupération + génération, sans
+    bookkeeping de session.
+
+    Returns:
+        {
+            "retrieval": Dict (voir retrieve_context),
+            "llm_result": Dict | None (None : aucun contexte pertinent),
+            "latency_generation_ms": int,
+            "timings": Dict[str, int] (embedding, retrieval, generation : étapes exécutées)
+        }
+    """
+    retrieval = await retrieve_context(question, top_k, score_threshold)
+    query_id = retrieval["query_id"]
+    filtered_chunks = retrieval["context_chunks"]
+    timings = dict(retrieval["timings"])
+
+    if retrieval["cached_result"] is not None:
+        llm_result = cached_llm_result(retrieval["cached_result"])
+        latency_generation_ms = 0
+    elif not filtered_chunks:
+        logger.warning(f"⚠️ No relevant context (threshold={score_threshold})")
+        llm_result = None
+        latency_generation_ms = 0
+    else:
+        # Génération + mesure latency
+        logger.info(f"✍️ RAG Pipeline [{query_id}]: generating with {len(filtered_chunks)} chunks...")
+        start_generation = time.perf_counter()
+        
+        llm_result = await generate_response(question, filtered_chunks)
+        latency_generation_ms = int((time.perf_counter() - start_generation) * 1000)
+        timings["generation_ms"] = latency_generation_ms
+
+        store_answer(question, retrieval, llm_result)
+
+    return {
+        "retrieval": retrieval,
+        "llm_result": llm_result,
+        "latency_generation_ms": latency_generation_ms,
+        "timings": timings
+    }
+
+
+def response_source(llm_result: Optional[Dict]) -> str:
+    """Origine de la réponse (label métrique) : llm | cache | coalesced | no_context."""
+    if llm_result is None:
+        return "no_context"
+    if llm_result["provider_used"] in ("cache", "coalesced"):
+        return llm_result["provider_used"]
+    return "llm"
+
+
+def coalesced_llm_result(llm_result: Dict) -> Dict:
+    """Résultat LLM vu par un appelant qui a partagé la génération d'un autre."""
+    return {
+        **llm_result,
+        "tokens_used": 0,
+        "provider_used": "coalesced",
+        "cost": 0.0
+    }
+
+
+@traced()
+async def rag_pipeline(
+    question: str,
+    session_id: str,
+    top_k: int = 6,
+    score_threshold: float = 0.7
+) -> Dict:
+    """
+    Pipeline RAG complet avec logging.
+
+    Les questions identiques (normalisées, même version des données) en
+    cours de traitement partagent une seule récupération + génération ;
+    session, métriques et messages restent enregistrés pour chaque appelant.
+    
+    Returns:
+        {
+            "query_id": str,
+            "response": str,
+            "context_chunks": List[Dict],
+            "tokens_used": int,
+            "cost": float,
+            "provider_used": str,
+            "cached": bool,
+            "questions_count": int,
+            "timings": Dict[str, int]  # embedding, retrieval, generation, logging (ms)
+        }
+    """
+    start_answer = time.perf_counter()
+    if settings.CHAT_COALESCING_ENABLED:
+        key = (normalize_question(question), await current_data_version(), top_k, score_threshold)
+        shared, coalesced = await question_flights.do(
+            key, lambda: answer_question(question, top_k, score_threshold)
+        )
+    else:
+        shared, coalesced = await answer_question(question, top_k, score_threshold), False
+
+    retrieval = shared["retrieval"]
+    llm_result = shared["llm_result"]
+    if coalesced:
+        # Coût déjà compté par l'appelant qui a lancé le calcul
+        retrieval = {**retrieval, "query_id": str(uuid.uuid4()), "embedding_tokens": 0}
+        if llm_result is not None:
+            llm_result = coalesced_llm_result(llm_result)
+
+    start_logging = time.perf_counter()
+    if llm_result is None:
+        result = no_context_result(retrieval["query_id"], await get_question_count(session_id))
+    else:
+        result = await record_exchange(
+            question, session_id, retrieval, llm_result, shared["latency_generation_ms"]
+        )
+    logging_ms = int((time.perf_counter() - start_logging) * 1000)
+
+    if coalesced:
+        # Étapes exécutées par l'appelant qui a lancé le calcul (déjà observées) : attente seule
+        timings = {"coalesced_wait_ms": int((start_logging - start_answer) * 1000), "logging_ms": logging_ms}
+    else:
+        timings = {**shared["timings"], "logging_ms": logging_ms}
+    observe_timings(timings)
+    record_timings(timings)
+    CHAT_REQUESTS.labels(response_source(llm_result)).inc()
+    annotate(query_id=result["query_id"], source=response_source(llm_result), coalesced=coalesced)
+
+    return {**result, "timings": timings}
+
+
+async def rag_pipeline_stream(
+    question: str,
+    session_id: str,
+    top_k: int = 6,
+    score_threshold: float = 0.7
+) -> AsyncIterator[Tuple[str, object]]:
+    """
+    Variante streaming du pipeline RAG.
+
+    Yields:
+        ("sources", List[Dict]) dès la fin de la recherche,
+        ("token", str) au fil de la génération,
+        ("done", Dict) avec le même résultat que rag_pipeline, une fois
+        la réponse complète enregistrée (session, métriques, messages).
+    """
+    retrieval = await retrieve_context(question, top_k, score_threshold)
+    query_id = retrieval["query_id"]
+    filtered_chunks = retrieval["context_chunks"]
+
+    yield ("sources", filtered_chunks)
+
+    if retrieval["cached_result"] is not None:
+        llm_result = cached_llm_result(retrieval["cached_result"])
+        latency_generation_ms = 0
+        yield ("token", llm_result["response"])
+    else:
+        if not filtered_chunks:
+            logger.warning(f"⚠️ No relevant context (threshold={score_threshold})")
+            start_logging = time.perf_counter()
+            result = no_context_result(query_id, await get_question_count(session_id))
+            yield ("token", result["response"])
+            timings = {
+                **retrieval["timings"],
+                "logging_ms": int((time.perf_counter() - start_logging) * 1000)
+            }
+            observe_timings(timings)
+            record_timings(timings)
+            CHAT_REQUESTS.labels(response_source(None)).inc()
+            yield ("done", {**result, "timings": timings})
+            return
+
+        logger.info(f"✍️ RAG Pipeline [{query_id}]: streaming with {len(filtered_chunks)} chunks...")
+        start_generation = time.perf_counter()
+
+        llm_result = None
+        with span("stream_response", "llm") as generation_span:
+            async for kind, payload in stream_response(question, filtered_chunks):
+                if kind == "token":
+                    yield ("token", payload)
+                else:
+                    llm_result = payload
+            generation_span.set(provider=llm_result["provider_used"], tokens=llm_result["tokens_used"])
+        latency_generation_ms = int((time.perf_counter() - start_generation) * 1000)
+
+        store_answer(question, retrieval, llm_result)
+
+    start_logging = time.perf_counter()
+    result = await record_exchange(question, session_id, retrieval, llm_result, latency_generation_ms)
+    timings = dict(retrieval["timings"])
+    if retrieval["cached_result"] is None:
+        timings["generation_ms"] = latency_generation_ms
+    timings["logging_ms"] = int((time.perf_counter() - start_logging) * 1000)
+    observe_timings(timings)
+    record_timings(timings)
+    CHAT_REQUESTS.labels(response_source(llm_result)).inc()
+    yield ("done", {**result, "timings": timings})
+
+
+@traced(kind="tool")
 async def log_chat_messages(
     session_id: str,
     user_message: str,
@@ -339,21 +804,16 @@ async def log_chat_messages(
     tokens_used: int
 ):
     """
-    Enregistre l'échange user/assistant dans chat_messages.
+    Enregistre l'échange user/assistant dans chat_messages (écriture différée).
     """
-    async with AsyncSessionLocal() as db:
-        # Message user
-        await db.execute(text("""
-            INSERT INTO chat_messages (session_id, role, content, tokens_used)
-            VALUES (:session_id, 'user', :content, 0)
-        """), {"session_id": session_id, "content": user_message})
-        
-        # Message assistant
-        await db.execute(text("""
-            INSERT INTO chat_messages (session_id, role, content, tokens_used)
-            VALUES (:session_id, 'assistant', :content, :tokens_used)
-        """), {"session_id": session_id, "content": assistant_response, "tokens_used": tokens_used})
-        
-        await db.commit()
+    # Message user
+    await telemetry.submit("chat_message", {
+        "session_id": session_id, "role": "user", "content": user_message, "tokens_used": 0
+    })
+    
+    # Message assistant
+    await telemetry.submit("chat_message", {
+        "session_id": session_id, "role": "assistant", "content": assistant_response, "tokens_used": tokens_used
+    })
     
-    logger.info(f"💬 Messages logged for session {session_id}")
\ No newline at end of file
+    logger.info(f"💬 Messages queued for session {session_id}")
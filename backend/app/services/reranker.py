@@ -0,0 +1,118 @@
+"""
+Re-ranking de diversité (Maximal Marginal Relevance) avant génération.
+
+Les candidats de la recherche sont souvent quasi-dupliqués (même
+expérience, projets voisins). MMR choisit itérativement le chunk qui
+maximise  λ·sim(question, chunk) − (1−λ)·max sim(chunk, déjà choisis),
+jusqu'à épuisement d'un budget de tokens : le prompt porte moins de
+chunks, plus variés.
+
+Tout est calculé en NumPy sur la matrice des embeddings candidats
+(une multiplication matricielle pour les similarités deux à deux).
+"""
+from typing import List, Dict
+import numpy as np
+from app.core.tokenizer import count_tokens
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_chunk_tokens(chunk: Dict, max_tokens_per_chunk: int) -> int:
+    """Coût d'un chunk dans le prompt (plafonné comme dans pack_context)."""
+    tokens = count_tokens(f"[{chunk['type'].upper()}] {chunk['title']}\n{chunk['description']}")
+    return min(tokens, max_tokens_per_chunk)
+
+
+def without_embeddings(chunks: List[Dict]) -> List[Dict]:
+    """Retire les embeddings candidats (inutiles après re-ranking, lourds en cache/log)."""
+    return [
+        {key: value for key, value in chunk.items() if key != "embedding"}
+        for chunk in chunks
+    ]
+
+
+def mmr_select(
+    query: np.ndarray,
+    candidates: np.ndarray,
+    costs: List[int],
+    lambda_mult: float,
+    token_budget: int
+) -> List[int]:
+    """
+    Sélection MMR gloutonne sous budget.
+
+    Args:
+        query: embedding de la question (d,), normalisé
+        candidates: embeddings candidats (n, d), lignes normalisées
+        costs: coût en tokens de chaque candidat
+        lambda_mult: 1.0 = pertinence pure, 0.0 = diversité pure
+        token_budget: somme maximale des coûts retenus
+
+    Returns:
+        Indices des candidats retenus, dans l'ordre de sélection
+    """
+    n = candidates.shape[0]
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+
+    selected: List[int] = []
+    available = np.ones(n, dtype=bool)
+    max_similarity = np.full(n, -np.inf, dtype=np.float32)
+    remaining = token_budget
+
+    while available.any():
+        redundancy = np.where(np.isfinite(max_similarity), max_similarity, 0.0)
+        mmr = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        mmr[~available] = -np.inf
+        best = int(np.argmax(mmr))
+        available[best] = False
+
+        if costs[best] > remaining:
+            # Trop gros pour le budget restant : on essaie les suivants
+            continue
+
+        selected.append(best)
+        remaining -= costs[best]
+        max_similarity = np.maximum(max_similarity, similarity[best])
+
+    return selected
+
+
+def mmr_rerank(
+    query_embedding: List[float],
+    chunks: List[Dict],
+    lambda_mult: float = 0.7,
+    token_budget: int = 1500,
+    max_tokens_per_chunk: int = 300
+) -> List[Dict]:
+    """
+    Applique MMR aux chunks portant une clé "embedding".
+
+    Sans embeddings (ou moins de deux candidats), les chunks sont
+    renvoyés dans leur ordre d'origine.
+
+    Returns:
+        Chunks retenus (ordre MMR), sans la clé "embedding"
+    """
+    if len(chunks) < 2 or any(chunk.get("embedding") is None for chunk in chunks):
+        return without_embeddings(chunks)
+
+    candidates = np.vstack([np.asarray(c["embedding"], dtype=np.float32) for c in chunks])
+    norms = np.linalg.norm(candidates, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    candidates = candidates / norms
+
+    query = np.asarray(query_embedding, dtype=np.float32)
+    norm = np.linalg.norm(query)
+    if norm > 0:
+        query = query / norm
+
+    costs = [estimate_chunk_tokens(chunk, max_tokens_per_chunk) for chunk in chunks]
+    selected = mmr_select(query, candidates, costs, lambda_mult, token_budget)
+
+    logger.info(
+        f"🎯 MMR: {len(chunks)} → {len(selected)} chunks "
+        f"(~{sum(costs[i] for i in selected)}/{token_budget} tokens, λ={lambda_mult})"
+    )
+    return without_embeddings([chunks[i] for i in selected])
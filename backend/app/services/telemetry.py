@@ -0,0 +1,215 @@
+"""
+File d'écriture différée (write-behind) pour la télémétrie du chat.
+
+Les lignes retrieval_logs et chat_messages sont mises en file en mémoire
+puis écrites par une tâche de fond, par lots, en INSERT multi-lignes dans
+une seule transaction. La réponse à l'utilisateur n'attend plus ces
+écritures. (chat_sessions reste synchrone : un upsert atomique qui
+retourne question_count, voir rag.update_session_metrics.)
+
+Flush déclenché par taille (TELEMETRY_BATCH_SIZE) ou par temps
+(TELEMETRY_FLUSH_INTERVAL_SECONDS). File bornée : quand elle est pleine,
+on attend (TELEMETRY_BACKPRESSURE) ou on jette la ligne avec un compteur.
+Un lot en échec est réécrit ligne par ligne (une transaction par ligne) :
+seules les lignes qui échouent encore sont perdues. À l'arrêt, le reste de
+la file est écrit par lots d'au plus TELEMETRY_BATCH_SIZE lignes.
+"""
+import asyncio
+from collections import defaultdict
+from typing import List, Dict, Optional, Tuple
+from sqlalchemy import text
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+import logging
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_LOG_COLUMNS = [
+    "query_id", "session_id", "query_text", "retrieved_chunks",
+    "retrieval_method", "nb_chunks_retrieved",
+    "llm_provider", "embedding_tokens", "llm_tokens",
+    "embedding_cost", "llm_cost", "total_cost",
+    "latency_retrieval_ms", "latency_generation_ms", "latency_total_ms",
+    "latency_ms",
+]
+
+CHAT_MESSAGE_COLUMNS = ["session_id", "role", "content", "tokens_used"]
+
+
+def values_clause(rows: List[Dict], columns: List[str]) -> Tuple[str, Dict]:
+    """Construit "(:a_0, :b_0), (:a_1, :b_1)..." et les paramètres associés."""
+    placeholders = []
+    params = {}
+    for i, row in enumerate(rows):
+        names = []
+        for column in columns:
+            key = f"{column}_{i}"
+            params[key] = row[column]
+            names.append(f":{key}")
+        placeholders.append("(" + ", ".join(names) + ")")
+    return ",\n".join(placeholders), params
+
+
+class TelemetryWriter:
+    """File bornée + tâche de fond qui écrit par lots."""
+
+    def __init__(self, max_size: int, batch_size: int, flush_interval: float, backpressure: bool):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.backpressure = backpressure
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.enqueued = 0
+        self.dropped = 0
+        self.flushed_rows = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.lost_rows = 0
+
+    def _ensure_started(self) -> None:
+        if self._task is None or self._task.done():
+            self.start()
+
+    def start(self) -> None:
+        """Démarre la tâche de flush (appelé dans le lifespan)."""
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"📝 Telemetry writer started (batch={self.batch_size}, interval={self.flush_interval}s)")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Vide la file puis arrête la tâche (appelé à l'arrêt)."""
+        if self._task is None or self._task.done():
+            return
+        await self._queue.put(None)  # Sentinelle : flush final puis sortie
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"❌ Telemetry drain timed out, {self._queue.qsize()} rows lost")
+            self._task.cancel()
+        logger.info("Telemetry writer stopped")
+
+    async def submit(self, kind: str, row: Dict) -> None:
+        """
+        Met une ligne en file.
+
+        kind: "retrieval_log" | "chat_message"
+        """
+        self._ensure_started()
+        record = (kind, row)
+        if self.backpressure:
+            await self._queue.put(record)
+        else:
+            try:
+                self._queue.put_nowait(record)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                logger.warning(f"⚠️ Telemetry queue full, {kind} row dropped ({self.dropped} total)")
+                return
+        self.enqueued += 1
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            stop = False
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+            if stop:
+                # Vider ce qui reste avant de sortir
+                rest = []
+                while not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    if item is not None:
+                        rest.append(item)
+                for start in range(0, len(rest), self.batch_size):
+                    await self._flush(rest[start:start + self.batch_size])
+                return
+
+    async def _write(self, batch: List[Tuple[str, Dict]]) -> None:
+        """Un lot en une transaction : logs puis messages (la session existe déjà, upsert synchrone)."""
+        grouped: Dict[str, List[Dict]] = defaultdict(list)
+        for kind, row in batch:
+            grouped[kind].append(row)
+
+        async with AsyncSessionLocal() as db:
+            if grouped["retrieval_log"]:
+                values, params = values_clause(grouped["retrieval_log"], RETRIEVAL_LOG_COLUMNS)
+                await db.execute(text(
+                    f"INSERT INTO retrieval_logs ({', '.join(RETRIEVAL_LOG_COLUMNS)}) VALUES {values}"
+                ), params)
+
+            if grouped["chat_message"]:
+                values, params = values_clause(grouped["chat_message"], CHAT_MESSAGE_COLUMNS)
+                await db.execute(text(
+                    f"INSERT INTO chat_messages ({', '.join(CHAT_MESSAGE_COLUMNS)}) VALUES {values}"
+                ), params)
+
+            await db.commit()
+
+    async def _flush(self, batch: List[Tuple[str, Dict]]) -> None:
+        """Écrit un lot ; en cas d'échec, réessaie ligne par ligne avant de jeter."""
+        try:
+            await self._write(batch)
+            self.flushes += 1
+            self.flushed_rows += len(batch)
+            logger.info(
+                f"📝 Telemetry flushed: {sum(1 for kind, _ in batch if kind == 'retrieval_log')} logs, "
+                f"{sum(1 for kind, _ in batch if kind == 'chat_message')} messages"
+            )
+            return
+        except Exception as e:
+            self.flush_errors += 1
+            logger.warning(f"⚠️ Telemetry batch of {len(batch)} rows failed, retrying row by row: {e}")
+
+        # Logs avant messages, comme dans un lot
+        ordered = sorted(batch, key=lambda record: record[0] != "retrieval_log")
+        lost = 0
+        last_error = None
+        for record in ordered:
+            try:
+                await self._write([record])
+                self.flushed_rows += 1
+            except Exception as e:
+                lost += 1
+                last_error = e
+        if lost:
+            self.lost_rows += lost
+            logger.error(f"❌ Telemetry flush failed ({lost}/{len(batch)} rows lost): {last_error}")
+
+    def stats(self) -> Dict:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "max_size": self.max_size,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "flush_errors": self.flush_errors,
+            "lost_rows": self.lost_rows,
+        }
+
+
+telemetry = TelemetryWriter(
+    max_size=settings.TELEMETRY_QUEUE_SIZE,
+    batch_size=settings.TELEMETRY_BATCH_SIZE,
+    flush_interval=settings.TELEMETRY_FLUSH_INTERVAL_SECONDS,
+    backpressure=settings.TELEMETRY_BACKPRESSURE,
+)
@@ -0,0 +1,217 @@
+"""
+Index vectoriel en mémoire (NumPy) pour la recherche de contexte RAG.
+
+Le corpus du CV est petit : tous les embeddings sont chargés au démarrage
+dans une matrice float32 contiguë (lignes normalisées). Un top-k se résume
+alors à un produit matrice-vecteur + argpartition, sans aller-retour réseau.
+"""
+import asyncio
+import time
+from typing import Iterable, List, Dict, Optional, Tuple
+import numpy as np
+from sqlalchemy import text
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.services.lexical_index import LexicalIndex, reciprocal_rank_fusion
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Chunks précalculés (table rag_chunks, voir migration 004)
+CHUNKS_SQL = text("""
+    SELECT source_type, source_id, title, content, embedding::text, parent_id
+    FROM rag_chunks
+""")
+
+# Empreinte des données du CV : change à chaque refresh_rag_chunks() ou modification
+DATA_VERSION_SQL = text("""
+    SELECT md5(count(*) || ':' || coalesce(max(updated_at)::text, ''))
+    FROM rag_chunks
+""")
+
+
+async def fetch_data_version() -> str:
+    """Retourne l'empreinte courante des données du CV."""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(DATA_VERSION_SQL)
+        return result.scalar() or ""
+
+
+def parse_vector(value: str) -> np.ndarray:
+    """Convertit la représentation texte pgvector '[0.1,0.2,...]' en float32."""
+    return np.array(value.strip("[]").split(","), dtype=np.float32)
+
+
+class VectorIndex:
+    """
+    Snapshot immuable (matrice + métadonnées) remplacé atomiquement à chaque rechargement.
+    """
+
+    def __init__(self, refresh_seconds: int):
+        self.refresh_seconds = refresh_seconds
+        self.version: Optional[str] = None
+        self._matrix = np.zeros((0, settings.EMBEDDING_DIMENSIONS), dtype=np.float32)
+        self._chunks: List[Dict] = []
+        self._by_key: Dict[Tuple[str, int], Dict] = {}
+        self._lexical = LexicalIndex()
+        self._last_check = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.version is not None
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    async def load(self) -> None:
+        """(Re)charge tous les chunks et leurs embeddings depuis PostgreSQL."""
+        async with self._lock:
+            start = time.perf_counter()
+            version = await fetch_data_version()
+
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(CHUNKS_SQL)
+                rows = result.fetchall()
+
+            chunks = [
+                {"type": row[0], "id": row[1], "title": row[2], "description": row[3], "parent_id": row[5]}
+                for row in rows
+            ]
+            matrix = np.zeros((len(rows), settings.EMBEDDING_DIMENSIONS), dtype=np.float32)
+            for i, row in enumerate(rows):
+                matrix[i] = parse_vector(row[4])
+
+            # Normalisation : score cosinus = simple produit scalaire
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix = np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+            lexical = LexicalIndex()
+            lexical.build([f"{c['title']} {c['description']}" for c in chunks])
+
+            self._matrix, self._chunks, self._lexical, self.version = matrix, chunks, lexical, version
+            self._by_key = {(c["type"], c["id"]): c for c in chunks}
+            self._last_check = time.monotonic()
+
+            elapsed_ms = int((time.perf_counter() - start) * 1000)
+            logger.info(f"🧠 Vector index loaded: {len(chunks)} chunks, version {version[:8]} ({elapsed_ms}ms)")
+
+    async def refresh_if_changed(self) -> None:
+        """Recharge l'index uniquement si l'empreinte des données a changé."""
+        try:
+            self._last_check = time.monotonic()
+            version = await fetch_data_version()
+            if version != self.version:
+                logger.info("🔄 CV data changed, reloading vector index...")
+                await self.load()
+        except Exception as e:
+            logger.warning(f"⚠️ Vector index refresh failed: {e}")
+
+    def _schedule_refresh(self) -> None:
+        """Vérifie la fraîcheur en tâche de fond, sans bloquer la requête courante."""
+        if time.monotonic() - self._last_check < self.refresh_seconds:
+            return
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        self._last_check = time.monotonic()
+        self._refresh_task = asyncio.create_task(self.refresh_if_changed())
+
+    def lookup(self, source_type: str, ids: Iterable[int]) -> Dict[int, Dict]:
+        """Chunks par id (sans score), ex. en-têtes d'expériences parentes."""
+        by_key = self._by_key
+        return {
+            i: by_key[(source_type, i)]
+            for i in ids
+            if (source_type, i) in by_key
+        }
+
+    def _cosine_scores(self, matrix: np.ndarray, embedding: List[float]) -> np.ndarray:
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+        return matrix @ query
+
+    @staticmethod
+    def _top_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])]
+
+    def search(self, embedding: List[float], top_k: int) -> List[Dict]:
+        """
+        Top-k par similarité cosinus.
+
+        Returns:
+            Liste de dicts avec {type, id, title, description, score, embedding}
+            (embedding : ligne normalisée de la matrice, pour le re-ranking MMR)
+        """
+        self._schedule_refresh()
+
+        matrix, chunks = self._matrix, self._chunks
+        if not chunks:
+            return []
+
+        scores = self._cosine_scores(matrix, embedding)
+        return [
+            {**chunks[i], "score": float(scores[i]), "embedding": matrix[i]}
+            for i in self._top_indices(scores, top_k)
+        ]
+
+    def search_hybrid(self, embedding: List[float], question: str, top_k: int, rrf_k: int = 60) -> List[Dict]:
+        """
+        Top-k vectoriel + top-k BM25, fusionnés par reciprocal rank fusion.
+
+        Returns:
+            Liste de dicts avec {type, id, title, description, score,
+            rrf_score, lexical_match, embedding}, triés par rrf_score ("score" reste
+            la similarité cosinus).
+        """
+        self._schedule_refresh()
+
+        matrix, chunks, lexical = self._matrix, self._chunks, self._lexical
+        if not chunks:
+            return []
+
+        scores = self._cosine_scores(matrix, embedding)
+        vector_ranking = [int(i) for i in self._top_indices(scores, top_k)]
+        lexical_ranking = [doc_id for doc_id, _ in lexical.search(question, top_k)]
+
+        fused = reciprocal_rank_fusion([vector_ranking, lexical_ranking], k=rrf_k)
+        lexical_hits = set(lexical_ranking)
+        ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+        return [
+            {
+                **chunks[i],
+                "score": float(scores[i]),
+                "rrf_score": rrf_score,
+                "lexical_match": i in lexical_hits,
+                "embedding": matrix[i]
+            }
+            for i, rrf_score in ranked
+        ]
+
+
+vector_index = VectorIndex(refresh_seconds=settings.VECTOR_INDEX_REFRESH_SECONDS)
+
+
+_version_memo = {"value": None, "checked_at": 0.0}
+
+
+async def current_data_version() -> str:
+    """
+    Version des données du CV : celle de l'index en mémoire s'il est chargé,
+    sinon l'empreinte SQL, relue au plus toutes les VECTOR_INDEX_REFRESH_SECONDS.
+    """
+    if vector_index.is_loaded:
+        return vector_index.version
+
+    now = time.monotonic()
+    if _version_memo["value"] is None or now - _version_memo["checked_at"] > settings.VECTOR_INDEX_REFRESH_SECONDS:
+        _version_memo["value"] = await fetch_data_version()
+        _version_memo["checked_at"] = now
+    return _version_memo["value"]
@@ -0,0 +1,112 @@
+"""
+Warm-up du démarrage, exécuté dans le lifespan avant que l'API n'accepte
+du trafic (uvicorn n'ouvre le port qu'après le startup).
+
+Le conteneur serverless démarre à froid à la première visite : ce que la
+première question paierait sinon (connexions du pool DB, TCP+TLS vers les
+providers d'embeddings, import de litellm, encodage tiktoken, index
+vectoriel) est fait ici, étapes en parallèle, chacune bornée par
+WARMUP_TIMEOUT_SECONDS. Une étape en échec est journalisée sans bloquer le
+démarrage : la première requête refera le travail à la demande.
+
+Durées par étape : /api/health/startup.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional
+from sqlalchemy import text
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, engine
+from app.core.http_client import http_clients
+from app.core.llm_client import get_litellm
+from app.core.tokenizer import get_encoding
+from app.services.vector_index import vector_index
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def prime_db_pool() -> None:
+    """Ouvre WARMUP_DB_CONNECTIONS connexions du pool, tenues simultanément."""
+    async def ping() -> None:
+        async with AsyncSessionLocal() as db:
+            await db.execute(text("SELECT 1"))
+
+    connections = min(settings.WARMUP_DB_CONNECTIONS, engine.sync_engine.pool.size())
+    await asyncio.gather(*[ping() for _ in range(connections)])
+
+
+async def warm_http_clients() -> None:
+    """Connexions vers les providers d'embeddings dont la clé API est configurée."""
+    providers = [
+        provider for provider, api_key in (
+            ("voyage", settings.VOYAGE_API_KEY),
+            ("mistral", settings.MISTRAL_API_KEY),
+        )
+        if api_key
+    ]
+    await http_clients.warm(providers)
+
+
+async def load_vector_index() -> None:
+    try:
+        await vector_index.load()
+    except Exception as e:
+        logger.error(f"❌ Vector index load failed, falling back to pgvector: {e}")
+        raise
+
+
+class WarmUp:
+    """Étapes du warm-up et leur durée / issue."""
+
+    def __init__(self):
+        self.steps: Dict[str, Dict] = {}
+        self.duration_ms: Optional[int] = None
+        self.ready = False
+
+    def plan(self) -> Dict[str, Callable[[], Awaitable]]:
+        steps: Dict[str, Callable[[], Awaitable]] = {}
+        # L'index en mémoire est nécessaire au backend "memory", warm-up activé ou non
+        if settings.RETRIEVAL_BACKEND == "memory":
+            steps["vector_index"] = load_vector_index
+        if not settings.WARMUP_ENABLED:
+            return steps
+        steps["db_pool"] = prime_db_pool
+        steps["tokenizer"] = lambda: asyncio.to_thread(get_encoding)
+        if not settings.OFFLINE_PROVIDERS:
+            steps["http_clients"] = warm_http_clients
+            steps["litellm"] = lambda: asyncio.to_thread(get_litellm)
+        return steps
+
+    async def _run_step(self, name: str, step: Callable[[], Awaitable]) -> None:
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(step(), timeout=settings.WARMUP_TIMEOUT_SECONDS)
+            status = "ok"
+        except asyncio.TimeoutError:
+            status = "timeout"
+            logger.warning(f"⚠️ Warm-up {name} timed out ({settings.WARMUP_TIMEOUT_SECONDS}s)")
+        except Exception as e:
+            status = "error"
+            logger.warning(f"⚠️ Warm-up {name} failed: {e}")
+        self.steps[name] = {"status": status, "duration_ms": int((time.perf_counter() - start) * 1000)}
+
+    async def run(self) -> None:
+        """Exécute toutes les étapes en parallèle (appelé dans le lifespan)."""
+        start = time.perf_counter()
+        await asyncio.gather(*[self._run_step(name, step) for name, step in self.plan().items()])
+        self.duration_ms = int((time.perf_counter() - start) * 1000)
+        self.ready = True
+        summary = ", ".join(f"{name} {step['duration_ms']}ms" for name, step in self.steps.items())
+        logger.info(f"🔥 Warm-up done in {self.duration_ms}ms ({summary or 'nothing to do'})")
+
+    def stats(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "enabled": settings.WARMUP_ENABLED,
+            "duration_ms": self.duration_ms,
+            "steps": self.steps,
+        }
+
+
+warmup = WarmUp()
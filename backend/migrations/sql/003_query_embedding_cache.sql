@@ -0,0 +1,43 @@
+-- ============================================================================
+-- 003_query_embedding_cache.sql
+-- Cache persistant des embeddings de questions (2e niveau du cache)
+-- ============================================================================
+
+-- Vérifier que migration non déjà appliquée
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM schema_migrations WHERE filename = '003_query_embedding_cache.sql') THEN
+        RAISE EXCEPTION 'Migration 003_query_embedding_cache.sql already applied';
+    END IF;
+END $$;
+
+-- ============================================================================
+-- TABLE: query_embedding_cache
+-- ============================================================================
+
+-- cache_key = sha256(modèle + dimensions + question normalisée)
+-- embedding sans dimension fixe : un changement de modèle change la clé
+CREATE TABLE query_embedding_cache (
+    cache_key CHAR(64) PRIMARY KEY,
+    model VARCHAR(100) NOT NULL,
+    dimensions INTEGER NOT NULL,
+    query_text TEXT NOT NULL,
+    embedding VECTOR NOT NULL,
+    created_at TIMESTAMP DEFAULT now() NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS query_embedding_cache_model_idx
+ON query_embedding_cache (model, dimensions);
+
+-- ============================================================================
+-- ENREGISTRER migration
+-- ============================================================================
+
+INSERT INTO schema_migrations (filename) VALUES ('003_query_embedding_cache.sql');
+
+-- Confirmation
+DO $$
+BEGIN
+    RAISE NOTICE '✅ Migration 003 applied successfully';
+    RAISE NOTICE 'query_embedding_cache created';
+END $$;
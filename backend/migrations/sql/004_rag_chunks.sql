@@ -0,0 +1,124 @@
+-- ============================================================================
+-- 004_rag_chunks.sql
+-- Table dénormalisée des chunks RAG (texte précalculé + un seul index HNSW)
+-- ============================================================================
+
+-- Vérifier que migration non déjà appliquée
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM schema_migrations WHERE filename = '004_rag_chunks.sql') THEN
+        RAISE EXCEPTION 'Migration 004_rag_chunks.sql already applied';
+    END IF;
+END $$;
+
+-- ============================================================================
+-- TABLE: rag_chunks
+-- ============================================================================
+
+CREATE TABLE rag_chunks (
+    id SERIAL PRIMARY KEY,
+    source_type VARCHAR(50) NOT NULL,   -- experience | formation | information
+    source_id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    content TEXT NOT NULL,
+    embedding VECTOR(1024) NOT NULL,
+    created_at TIMESTAMP DEFAULT now() NOT NULL,
+    updated_at TIMESTAMP DEFAULT now() NOT NULL,
+    UNIQUE (source_type, source_id)
+);
+
+-- Index HNSW unique pour toute la recherche vectorielle
+CREATE INDEX IF NOT EXISTS rag_chunks_embedding_idx
+ON rag_chunks USING hnsw (embedding vector_cosine_ops);
+
+-- Trigger updated_at
+CREATE TRIGGER rag_chunks_updated_at
+    BEFORE UPDATE ON rag_chunks
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
+-- ============================================================================
+-- FONCTION: refresh_rag_chunks()
+-- Reconstruit rag_chunks depuis experiences / formations / informations.
+-- Appelée par scripts/seed_data.py après chaque seed.
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION refresh_rag_chunks()
+RETURNS INTEGER AS $$
+DECLARE
+    nb_chunks INTEGER;
+BEGIN
+    DELETE FROM rag_chunks;
+
+    -- Une ligne par expérience (projets agrégés, plus de doublons dus au JOIN)
+    INSERT INTO rag_chunks (source_type, source_id, title, content, embedding)
+    SELECT
+        'experience',
+        e.id,
+        e.role,
+        concat_ws(' ',
+            TO_CHAR(e.start_date, 'YYYY-MM-DD') || ' à ' || coalesce(TO_CHAR(e.end_date, 'YYYY-MM-DD'), 'aujourd''hui'),
+            'description :',
+            e.context,
+            (
+                SELECT string_agg(
+                    concat_ws(' ', p.objective, p.problem, p.solution, p.results, p.impact, p.description),
+                    ' ' ORDER BY p.start_date NULLS LAST, p.id
+                )
+                FROM projects p
+                WHERE p.experience_id = e.id
+            )
+        ),
+        e.embedding
+    FROM experiences e
+    WHERE e.embedding IS NOT NULL;
+
+    INSERT INTO rag_chunks (source_type, source_id, title, content, embedding)
+    SELECT
+        'formation',
+        f.id,
+        f.degree,
+        concat_ws(' ',
+            TO_CHAR(f.start_date, 'YYYY-MM-DD') || ' à ' || coalesce(TO_CHAR(f.end_date, 'YYYY-MM-DD'), 'aujourd''hui'),
+            'description',
+            f.description
+        ),
+        f.embedding
+    FROM formations f
+    WHERE f.embedding IS NOT NULL;
+
+    INSERT INTO rag_chunks (source_type, source_id, title, content, embedding)
+    SELECT
+        'information',
+        i.id,
+        concat_ws(' ',
+            'je suis', i.prenom, i.nom,
+            'avec le prenom prononcé', i.prononciation,
+            'né à', i.pays_naissance,
+            'le', TO_CHAR(i.date_naissance, 'YYYY-MM-DD')
+        ),
+        'Passioné depuis par les sciences dures et les nouvelles technologies, aussi je suis ' || coalesce(i.passion, ''),
+        i.embedding
+    FROM informations i
+    WHERE i.embedding IS NOT NULL;
+
+    SELECT count(*) INTO nb_chunks FROM rag_chunks;
+    RETURN nb_chunks;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Remplissage initial
+SELECT refresh_rag_chunks();
+
+-- ============================================================================
+-- ENREGISTRER migration
+-- ============================================================================
+
+INSERT INTO schema_migrations (filename) VALUES ('004_rag_chunks.sql');
+
+-- Confirmation
+DO $$
+BEGIN
+    RAISE NOTICE '✅ Migration 004 applied successfully';
+    RAISE NOTICE 'rag_chunks created with HNSW index, filled by refresh_rag_chunks()';
+END $$;
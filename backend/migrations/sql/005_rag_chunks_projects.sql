@@ -0,0 +1,125 @@
+-- ============================================================================
+-- 005_rag_chunks_projects.sql
+-- Projets comme source de recherche à part entière dans rag_chunks
+-- ============================================================================
+
+-- Vérifier que migration non déjà appliquée
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM schema_migrations WHERE filename = '005_rag_chunks_projects.sql') THEN
+        RAISE EXCEPTION 'Migration 005_rag_chunks_projects.sql already applied';
+    END IF;
+END $$;
+
+-- ============================================================================
+-- ENRICHIR rag_chunks
+-- ============================================================================
+
+-- parent_id : expérience parente d'un chunk 'project' (NULL sinon)
+ALTER TABLE rag_chunks
+  ADD COLUMN parent_id INTEGER;
+
+CREATE INDEX IF NOT EXISTS rag_chunks_parent_id_idx
+ON rag_chunks (parent_id);
+
+-- ============================================================================
+-- FONCTION: refresh_rag_chunks()
+-- Les expériences ne portent plus que leur en-tête ; chaque projet devient
+-- un chunk avec son propre embedding (projects.embedding).
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION refresh_rag_chunks()
+RETURNS INTEGER AS $$
+DECLARE
+    nb_chunks INTEGER;
+BEGIN
+    DELETE FROM rag_chunks;
+
+    -- En-tête d'expérience (une ligne par expérience)
+    INSERT INTO rag_chunks (source_type, source_id, title, content, embedding)
+    SELECT
+        'experience',
+        e.id,
+        e.role,
+        concat_ws(' ',
+            TO_CHAR(e.start_date, 'YYYY-MM-DD') || ' à ' || coalesce(TO_CHAR(e.end_date, 'YYYY-MM-DD'), 'aujourd''hui'),
+            'chez ' || e.company,
+            '(' || e.location || ')',
+            'description :',
+            e.context,
+            'Technologies : ' || array_to_string(e.technologies, ', ')
+        ),
+        e.embedding
+    FROM experiences e
+    WHERE e.embedding IS NOT NULL;
+
+    -- Projets rattachés à leur expérience
+    INSERT INTO rag_chunks (source_type, source_id, parent_id, title, content, embedding)
+    SELECT
+        'project',
+        p.id,
+        p.experience_id,
+        p.name,
+        concat_ws(' ',
+            TO_CHAR(p.start_date, 'YYYY-MM-DD') || ' à ' || coalesce(TO_CHAR(p.end_date, 'YYYY-MM-DD'), 'aujourd''hui'),
+            p.description,
+            'Objectif : ' || p.objective,
+            'Problème : ' || p.problem,
+            'Solution : ' || p.solution,
+            'Résultats : ' || p.results,
+            'Impact : ' || p.impact,
+            'Stack : ' || p.stack
+        ),
+        p.embedding
+    FROM projects p
+    WHERE p.embedding IS NOT NULL;
+
+    INSERT INTO rag_chunks (source_type, source_id, title, content, embedding)
+    SELECT
+        'formation',
+        f.id,
+        f.degree,
+        concat_ws(' ',
+            TO_CHAR(f.start_date, 'YYYY-MM-DD') || ' à ' || coalesce(TO_CHAR(f.end_date, 'YYYY-MM-DD'), 'aujourd''hui'),
+            'description',
+            f.description
+        ),
+        f.embedding
+    FROM formations f
+    WHERE f.embedding IS NOT NULL;
+
+    INSERT INTO rag_chunks (source_type, source_id, title, content, embedding)
+    SELECT
+        'information',
+        i.id,
+        concat_ws(' ',
+            'je suis', i.prenom, i.nom,
+            'avec le prenom prononcé', i.prononciation,
+            'né à', i.pays_naissance,
+            'le', TO_CHAR(i.date_naissance, 'YYYY-MM-DD')
+        ),
+        'Passioné depuis par les sciences dures et les nouvelles technologies, aussi je suis ' || coalesce(i.passion, ''),
+        i.embedding
+    FROM informations i
+    WHERE i.embedding IS NOT NULL;
+
+    SELECT count(*) INTO nb_chunks FROM rag_chunks;
+    RETURN nb_chunks;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Reconstruction avec les projets
+SELECT refresh_rag_chunks();
+
+-- ============================================================================
+-- ENREGISTRER migration
+-- ============================================================================
+
+INSERT INTO schema_migrations (filename) VALUES ('005_rag_chunks_projects.sql');
+
+-- Confirmation
+DO $$
+BEGIN
+    RAISE NOTICE '✅ Migration 005 applied successfully';
+    RAISE NOTICE 'rag_chunks: project chunks added (parent_id = experience)';
+END $$;
@@ -0,0 +1,39 @@
+-- ============================================================================
+-- 006_rag_chunks_lexical.sql
+-- Recherche plein texte sur rag_chunks (retrieval hybride lexical + vectoriel)
+-- ============================================================================
+
+-- Vérifier que migration non déjà appliquée
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM schema_migrations WHERE filename = '006_rag_chunks_lexical.sql') THEN
+        RAISE EXCEPTION 'Migration 006_rag_chunks_lexical.sql already applied';
+    END IF;
+END $$;
+
+-- ============================================================================
+-- COLONNE tsvector générée + index GIN
+-- Maintenue automatiquement par PostgreSQL à chaque refresh_rag_chunks()
+-- ============================================================================
+
+ALTER TABLE rag_chunks
+  ADD COLUMN content_tsv tsvector
+  GENERATED ALWAYS AS (
+    to_tsvector('french', coalesce(title, '') || ' ' || coalesce(content, ''))
+  ) STORED;
+
+CREATE INDEX IF NOT EXISTS rag_chunks_content_tsv_idx
+ON rag_chunks USING gin (content_tsv);
+
+-- ============================================================================
+-- ENREGISTRER migration
+-- ============================================================================
+
+INSERT INTO schema_migrations (filename) VALUES ('006_rag_chunks_lexical.sql');
+
+-- Confirmation
+DO $$
+BEGIN
+    RAISE NOTICE '✅ Migration 006 applied successfully';
+    RAISE NOTICE 'rag_chunks: content_tsv (french) + GIN index';
+END $$;
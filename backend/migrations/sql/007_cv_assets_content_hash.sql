@@ -0,0 +1,44 @@
+-- ============================================================================
+-- 007_cv_assets_content_hash.sql
+-- Empreinte sha256 des binaires du CV (ETag + clé du cache d'assets)
+-- ============================================================================
+
+-- Vérifier que migration non déjà appliquée
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM schema_migrations WHERE filename = '007_cv_assets_content_hash.sql') THEN
+        RAISE EXCEPTION 'Migration 007_cv_assets_content_hash.sql already applied';
+    END IF;
+END $$;
+
+-- ============================================================================
+-- COLONNE content_hash sur cv_files et cv_pages
+-- Tables créées par scripts/upload_cv_pdf.py : ignorées si le CV n'a
+-- jamais été uploadé (le script crée alors directement la colonne)
+-- ============================================================================
+
+DO $$
+BEGIN
+    IF to_regclass('cv_files') IS NOT NULL THEN
+        ALTER TABLE cv_files ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+        UPDATE cv_files SET content_hash = encode(sha256(file_data), 'hex') WHERE content_hash IS NULL;
+    END IF;
+
+    IF to_regclass('cv_pages') IS NOT NULL THEN
+        ALTER TABLE cv_pages ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+        UPDATE cv_pages SET content_hash = encode(sha256(image_data), 'hex') WHERE content_hash IS NULL;
+    END IF;
+END $$;
+
+-- ============================================================================
+-- ENREGISTRER migration
+-- ============================================================================
+
+INSERT INTO schema_migrations (filename) VALUES ('007_cv_assets_content_hash.sql');
+
+-- Confirmation
+DO $$
+BEGIN
+    RAISE NOTICE '✅ Migration 007 applied successfully';
+    RAISE NOTICE 'cv_files, cv_pages: content_hash (sha256)';
+END $$;
@@ -0,0 +1,45 @@
+-- ============================================================================
+-- 008_cv_assets_external_storage.sql
+-- Stockage TOAST non compressé des binaires du CV (lecture par tranches)
+-- ============================================================================
+
+-- Vérifier que migration non déjà appliquée
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM schema_migrations WHERE filename = '008_cv_assets_external_storage.sql') THEN
+        RAISE EXCEPTION 'Migration 008_cv_assets_external_storage.sql already applied';
+    END IF;
+END $$;
+
+-- ============================================================================
+-- STORAGE EXTERNAL sur file_data / image_data
+-- substring() sur une valeur EXTERNAL ne lit que les blocs TOAST de la
+-- tranche (streaming / Range de /api/cv) ; compressée (EXTENDED), la valeur
+-- entière serait décompressée à chaque tranche. PDF et PNG sont déjà
+-- compressés : la taille en base ne change presque pas.
+-- S'applique aux valeurs écrites ensuite : relancer scripts/upload_cv_pdf.py.
+-- ============================================================================
+
+DO $$
+BEGIN
+    IF to_regclass('cv_files') IS NOT NULL THEN
+        ALTER TABLE cv_files ALTER COLUMN file_data SET STORAGE EXTERNAL;
+    END IF;
+
+    IF to_regclass('cv_pages') IS NOT NULL THEN
+        ALTER TABLE cv_pages ALTER COLUMN image_data SET STORAGE EXTERNAL;
+    END IF;
+END $$;
+
+-- ============================================================================
+-- ENREGISTRER migration
+-- ============================================================================
+
+INSERT INTO schema_migrations (filename) VALUES ('008_cv_assets_external_storage.sql');
+
+-- Confirmation
+DO $$
+BEGIN
+    RAISE NOTICE '✅ Migration 008 applied successfully';
+    RAISE NOTICE 'cv_files.file_data, cv_pages.image_data: STORAGE EXTERNAL';
+END $$;
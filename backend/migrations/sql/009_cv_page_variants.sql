@@ -0,0 +1,46 @@
+-- ============================================================================
+-- 009_cv_page_variants.sql
+-- Variantes des pages du CV (WebP/AVIF, plusieurs largeurs)
+-- ============================================================================
+
+-- Vérifier que migration non déjà appliquée
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM schema_migrations WHERE filename = '009_cv_page_variants.sql') THEN
+        RAISE EXCEPTION 'Migration 009_cv_page_variants.sql already applied';
+    END IF;
+END $$;
+
+-- ============================================================================
+-- TABLE cv_page_variants
+-- Alimentée par scripts/upload_cv_pdf.py à côté du PNG 300 DPI de cv_pages ;
+-- servie par /api/cv/page/{n}?w= (négociation Accept) et /api/cv/asset/{hash}
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS cv_page_variants (
+    id SERIAL PRIMARY KEY,
+    page_number INTEGER NOT NULL,
+    format VARCHAR(10) NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    image_data BYTEA NOT NULL,
+    content_hash VARCHAR(64) NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW(),
+    UNIQUE (page_number, format, width)
+);
+
+-- Lecture par tranches (voir migration 008)
+ALTER TABLE cv_page_variants ALTER COLUMN image_data SET STORAGE EXTERNAL;
+
+-- ============================================================================
+-- ENREGISTRER migration
+-- ============================================================================
+
+INSERT INTO schema_migrations (filename) VALUES ('009_cv_page_variants.sql');
+
+-- Confirmation
+DO $$
+BEGIN
+    RAISE NOTICE '✅ Migration 009 applied successfully';
+    RAISE NOTICE 'cv_page_variants: page_number, format, width, image_data, content_hash';
+END $$;
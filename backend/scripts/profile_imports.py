@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Profil du temps d'import de l'API (démarrage à froid).
+
+Lance `python -X importtime -c "import app.main"` dans un processus neuf et
+agrège le temps cumulé par package de premier niveau (litellm, sqlalchemy,
+fastapi, numpy...) : ce que paie chaque démarrage avant même le lifespan.
+
+Usage (depuis backend/) :
+  python scripts/profile_imports.py [--module app.main] [--top 25] [--json]
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+# "import time:       412 |       1234 |   package.module"
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)")
+
+
+def profile(module):
+    """Temps d'import (µs) par module, mesurés dans un processus neuf."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(BACKEND_DIR), os.environ.get("PYTHONPATH")]))}
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        print(f"❌ Import de {module} en échec")
+        sys.exit(1)
+
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            # Indentation de 1 espace au premier niveau, +2 par niveau d'imbrication
+            imports.append({
+                "name": name,
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+                "depth": (len(indent) - 1) // 2,
+            })
+    return imports, wall_ms
+
+
+def by_package(imports):
+    """Temps propre (µs) cumulé par package de premier niveau."""
+    totals = defaultdict(int)
+    for item in imports:
+        totals[item["name"].split(".")[0]] += item["self_us"]
+    return dict(sorted(totals.items(), key=lambda kv: kv[1], reverse=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profil du temps d'import de l'API")
+    parser.add_argument('--module', default='app.main', help='Module à importer (défaut: app.main)')
+    parser.add_argument('--top', type=int, default=25, help='Nombre de packages affichés (défaut: 25)')
+    parser.add_argument('--json', action='store_true', help='Sortie JSON (comparaison entre versions)')
+    args = parser.parse_args()
+
+    imports, wall_ms = profile(args.module)
+    packages = by_package(imports)
+    total_ms = sum(packages.values()) / 1000
+
+    if args.json:
+        print(json.dumps({
+            "module": args.module,
+            "wall_ms": round(wall_ms, 1),
+            "imports_ms": round(total_ms, 1),
+            "modules": len(imports),
+            "packages_ms": {name: round(us / 1000, 1) for name, us in list(packages.items())[:args.top]},
+        }, indent=2))
+        return
+
+    print(f"⏱️  import {args.module} : {total_ms:.0f}ms d'imports ({len(imports)} modules), "
+          f"{wall_ms:.0f}ms avec le démarrage de l'interpréteur\n")
+    print(f"{'package':<28}{'ms':>10}{'%':>8}")
+    for name, us in list(packages.items())[:args.top]:
+        print(f"{name:<28}{us / 1000:>10.1f}{100 * us / 1000 / total_ms:>7.1f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -16,6 +16,10 @@ import argparse
 import chardet
 from litellm import embedding
 
+# Embeddings déterministes hors ligne (--model-embeddings offline), partagés avec l'API
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core.offline import fake_embedding
+
 try:
     from voyageai import Client as VoyageClient
     import psycopg2
@@ -59,9 +63,6 @@ DB_PARAMS = {
 }
 
 VOYAGE_API_KEY = os.getenv("VOYAGE_API_KEY")
-if not VOYAGE_API_KEY:
-    print("VOYAGE_API_KEY manquante dans l'environnement")
-    sys.exit(1)
 
 # ────────────────────────────────────────────────
 #  Helpers
@@ -270,6 +271,11 @@ def save_embeddings_cache(cache: Dict):
 def get_embeddings(texts: List[str], modelEmbeddings: str, use_cache: bool = True) -> List[List[float]]:
     if not texts:
         return []
+
+    if modelEmbeddings == "offline":
+        # Calcul local instantané : pas de cache (il est partagé avec les vrais providers)
+        print(f"🔄 Calcul de {len(texts)} embeddings hors ligne")
+        return [fake_embedding(text, EMBEDDING_DIM) for text in texts]
     
     # Charger le cache existant
     cache = load_embeddings_cache() if use_cache else {}
@@ -500,6 +506,12 @@ def generate_sql_file(infos, exps, forms, all_skills, info_embs, exp_embs, proj_
                     f"  ON CONFLICT DO NOTHING;"
                 )
 
+    lines.append("")
+
+    # 6. rag_chunks (texte précalculé pour la recherche) ──
+    lines.append("  -- 6. rag_chunks")
+    lines.append("  PERFORM refresh_rag_chunks();")
+
     lines.append("")
     lines.append("END $$;")
     lines.append("")
@@ -543,9 +555,15 @@ def main():
                        help="Forcer le recalcul de tous les embeddings (ignorer le cache)")
     parser.add_argument(
         '--model-embeddings',
-        default='voyage'
+        default='voyage',
+        choices=['voyage', 'mistral', 'offline'],
+        help="offline : embeddings déterministes locaux (API lancée avec OFFLINE_PROVIDERS=true)"
     )
     args = parser.parse_args()
+
+    if args.model_embeddings == "voyage" and not VOYAGE_API_KEY:
+        print("VOYAGE_API_KEY manquante dans l'environnement")
+        sys.exit(1)
     
     use_cache = not args.force_recompute
     
@@ -0,0 +1,149 @@
+"""
+Benchmark de démarrage à froid : temps jusqu'à la première question réussie.
+
+Pour chaque run, lance un processus API neuf (uvicorn) pointé sur le serveur
+factice des providers (fake_providers.py) et mesure depuis le lancement :
+  - ready : premier /api/health sain (port ouvert, warm-up du lifespan terminé) ;
+  - first_chat : première réponse 200 de /api/chat (envoyée dès que ready) ;
+puis la latence de cette première question et celle d'une seconde question
+(API chaude), et le détail du warm-up (/api/health/startup).
+
+Mêmes prérequis que run_load_test.py (PostgreSQL local migré et alimenté).
+
+Usage (depuis backend/) :
+    python -m tests.load.cold_start --runs 5
+    python -m tests.load.cold_start --runs 5 --app-env WARMUP_ENABLED=false --label no-warmup
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict
+import httpx
+
+from tests.load.fake_providers import FakeProviderConfig
+from tests.load.run_load_test import (
+    QUESTIONS, RESULTS_DIR, parse_key_values, percentiles, start_app, start_fake_providers,
+)
+
+METRICS = ["ready_ms", "first_chat_ms", "first_chat_latency_ms", "second_chat_latency_ms"]
+
+
+async def wait_until_ready(client: httpx.AsyncClient, base_url: str, timeout: float) -> None:
+    """Sondage serré de /api/health (la résolution compte pour un temps de démarrage)."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = await client.get(f"{base_url}/api/health")
+            if response.status_code == 200 and response.json().get("status") == "healthy":
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.02)
+    raise RuntimeError(f"API not ready after {timeout}s ({base_url})")
+
+
+async def ask(client: httpx.AsyncClient, base_url: str, question: str, session_id: str) -> float:
+    """Latence (ms) d'une question ; lève si la réponse n'est pas 200."""
+    start = time.perf_counter()
+    response = await client.post(f"{base_url}/api/chat/", json={"message": question, "session_id": session_id})
+    response.raise_for_status()
+    return (time.perf_counter() - start) * 1000
+
+
+async def cold_start(base_url: str, fake_base: str, port: int, app_env: Dict[str, str], timeout: float) -> Dict:
+    """Un run : processus neuf → ready → première question → seconde question."""
+    session_id = str(uuid.uuid4())
+    start = time.perf_counter()
+    app_process = start_app(port, fake_base, app_env)
+    try:
+        async with httpx.AsyncClient(timeout=60.0) as client:
+            await wait_until_ready(client, base_url, timeout)
+            ready_ms = (time.perf_counter() - start) * 1000
+
+            first_latency_ms = await ask(client, base_url, QUESTIONS[0], session_id)
+            first_chat_ms = (time.perf_counter() - start) * 1000
+            second_latency_ms = await ask(client, base_url, QUESTIONS[1], session_id)
+
+            startup = (await client.get(f"{base_url}/api/health/startup")).json()
+    finally:
+        app_process.terminate()
+        app_process.wait(timeout=30)
+
+    return {
+        "ready_ms": round(ready_ms, 1),
+        "first_chat_ms": round(first_chat_ms, 1),
+        "first_chat_latency_ms": round(first_latency_ms, 1),
+        "second_chat_latency_ms": round(second_latency_ms, 1),
+        "warmup": startup,
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    # Latences des providers faibles et fixes : on mesure le démarrage, pas les providers
+    fake_config = FakeProviderConfig(
+        embedding_latency_ms=args.embedding_latency_ms,
+        embedding_jitter_ms=0.0,
+        llm_latency_ms=args.llm_latency_ms,
+        llm_jitter_ms=0.0,
+    )
+    fake_base = f"http://127.0.0.1:{args.fake_port}"
+    base_url = f"http://127.0.0.1:{args.app_port}"
+    app_env = parse_key_values(args.app_env)
+
+    fake_server = await start_fake_providers(fake_config, args.fake_port)
+    runs = []
+    try:
+        for run in range(1, args.runs + 1):
+            result = await cold_start(base_url, fake_base, args.app_port, app_env, args.timeout)
+            runs.append(result)
+            print(
+                f"  run {run}/{args.runs} : ready {result['ready_ms']:.0f}ms, "
+                f"first chat {result['first_chat_ms']:.0f}ms "
+                f"(latency {result['first_chat_latency_ms']:.0f}ms, then {result['second_chat_latency_ms']:.0f}ms)"
+            )
+    finally:
+        fake_server.should_exit = True
+
+    report = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "label": args.label,
+        "config": {
+            "runs": args.runs,
+            "fake_providers": vars(fake_config),
+            "app_env": app_env,
+        },
+        "results": {metric: percentiles([r[metric] for r in runs]) for metric in METRICS},
+        "runs": runs,
+    }
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"cold_start_{datetime.now():%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+
+    print(f"\n{'metric':<26}{'p50':>10}{'p95':>10}{'max':>10}")
+    for metric, stats in report["results"].items():
+        print(f"{metric:<26}{stats['p50']:>10}{stats['p95']:>10}{stats['max']:>10}")
+    print(f"\n📄 Report written to {output}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Cold start benchmark: time to first successful chat")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--embedding-latency-ms", type=float, default=20.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=100.0)
+    parser.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Variable d'environnement de l'API, ex. WARMUP_ENABLED=false")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Délai max avant ready (secondes)")
+    parser.add_argument("--fake-port", type=int, default=8765)
+    parser.add_argument("--app-port", type=int, default=8100)
+    parser.add_argument("--label", default="", help="Libellé du run (rapport)")
+    parser.add_argument("--output", help="Fichier JSON (défaut : tests/load/results/cold_start_<date>.json)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,141 @@
+"""
+Serveur HTTP factice remplaçant Voyage/Mistral (embeddings) et les LLM
+(endpoint OpenAI-compatible) pendant les tests de charge.
+
+Latence (moyenne + gigue, surchargeable par modèle) et taux d'erreur
+configurables. Les embeddings sont ceux du mode hors ligne de l'API
+(app.core.offline) : déterministes, et compatibles avec une base alimentée
+par scripts/seed_data.py --model-embeddings offline.
+"""
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.core.offline import fake_embedding
+
+ANSWER = (
+    "Ian'ch a travaillé sur des pipelines de données et des applications RAG. "
+    "Il met en avant une démarche structurée : cadrage, prototypage, mise en production. "
+    "Les projets les plus récents combinent FastAPI, PostgreSQL/pgvector et des LLM."
+)
+
+
+@dataclass
+class FakeProviderConfig:
+    dimensions: int = 1024
+    embedding_latency_ms: float = 80.0
+    embedding_jitter_ms: float = 20.0
+    embedding_error_rate: float = 0.0
+    llm_latency_ms: float = 1200.0
+    llm_jitter_ms: float = 300.0
+    llm_error_rate: float = 0.0
+    # Latence moyenne par modèle, ex. {"gemini/gemini-2.5-flash": 2500}
+    llm_latency_by_model: Dict[str, float] = field(default_factory=dict)
+    stream_chunk_words: int = 4
+
+
+def create_app(config: FakeProviderConfig) -> FastAPI:
+    app = FastAPI(title="Fake providers (load test)")
+    app.state.calls = Counter()
+    app.state.errors = Counter()
+
+    async def simulate(kind: str, mean_ms: float, jitter_ms: float, error_rate: float):
+        """Attend une latence tirée au hasard ; retourne une réponse d'erreur ou None."""
+        app.state.calls[kind] += 1
+        await asyncio.sleep(max(0.0, random.gauss(mean_ms, jitter_ms)) / 1000)
+        if random.random() < error_rate:
+            app.state.errors[kind] += 1
+            return JSONResponse(status_code=503, content={"error": {"message": "injected failure"}})
+        return None
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        error = await simulate(
+            "embedding", config.embedding_latency_ms, config.embedding_jitter_ms, config.embedding_error_rate
+        )
+        if error is not None:
+            return error
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        return {
+            "object": "list",
+            "data": [
+                {"object": "embedding", "index": i, "embedding": fake_embedding(text, config.dimensions)}
+                for i, text in enumerate(inputs)
+            ],
+            "model": body.get("model"),
+            "usage": {"total_tokens": sum(len(text.split()) for text in inputs)},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "unknown")
+        mean_ms = config.llm_latency_by_model.get(model, config.llm_latency_ms)
+        stream = body.get("stream", False)
+
+        # En streaming, la latence simulée précède le premier token
+        error = await simulate(f"llm:{model}", mean_ms, config.llm_jitter_ms, config.llm_error_rate)
+        if error is not None:
+            return error
+
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+        completion_tokens = len(ANSWER.split())
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        if not stream:
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": ANSWER},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            }
+
+        async def events():
+            words = ANSWER.split(" ")
+            step = config.stream_chunk_words
+            for i in range(0, len(words), step):
+                delta = " ".join(words[i:i + step]) + (" " if i + step < len(words) else "")
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(0.01)
+            final = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def stats():
+        return {"calls": dict(app.state.calls), "injected_errors": dict(app.state.errors)}
+
+    return app
@@ -0,0 +1,272 @@
+"""
+Test de charge de bout en bout de /api/chat.
+
+Démarre le serveur factice des providers (fake_providers.py), lance l'API
+(uvicorn, sous-processus) en la pointant dessus, envoie un trafic de chat
+concurrent puis écrit un rapport JSON : débit, erreurs et p50/p95/p99 par
+étape (embedding, retrieval, generation, logging, bout en bout).
+
+Prérequis : un PostgreSQL + pgvector local, migré et alimenté
+(migrations/sql puis scripts/seed_data.py --model-embeddings offline pour
+des scores de similarité réalistes), accessible via DATABASE_URL.
+
+Usage (depuis backend/) :
+    python -m tests.load.run_load_test --requests 300 --concurrency 30
+    python -m tests.load.run_load_test --llm-latency gemini/gemini-2.5-flash=4000 \\
+        --llm-error-rate 0.05 --app-env LLM_HEDGE_ENABLED=true
+
+Comparer deux runs : les rapports sont écrits dans tests/load/results/.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import httpx
+import numpy as np
+import uvicorn
+
+from tests.load.fake_providers import FakeProviderConfig, create_app
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+STAGES = ["embedding_ms", "retrieval_ms", "generation_ms", "logging_ms"]
+
+# Questions suggérées / typiques des visiteurs (répétitions voulues : caches, coalescing)
+QUESTIONS = [
+    "Quelles sont tes expériences en data engineering ?",
+    "As-tu déjà travaillé avec Kafka ou Spark ?",
+    "Quel est ton parcours de formation ?",
+    "Parle-moi de tes projets en IA générative.",
+    "Quelles technologies cloud maîtrises-tu ?",
+    "Quelle a été ta dernière expérience professionnelle ?",
+    "As-tu de l'expérience avec FastAPI et PostgreSQL ?",
+    "Quels projets RAG as-tu réalisés ?",
+    "Pourquoi t'intéresses-tu aux sciences dures ?",
+    "Quelles méthodologies de travail utilises-tu ?",
+    "As-tu managé une équipe ?",
+    "Quels langages de programmation utilises-tu au quotidien ?",
+]
+
+
+def parse_key_values(items: List[str], cast=str) -> Dict:
+    """["a=1", "b=2"] -> {"a": cast("1"), "b": cast("2")}"""
+    values = {}
+    for item in items:
+        key, _, value = item.partition("=")
+        values[key.strip()] = cast(value.strip())
+    return values
+
+
+def percentiles(values: List[float]) -> Optional[Dict]:
+    if not values:
+        return None
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": len(values),
+        "mean": round(float(np.mean(values)), 1),
+        "p50": round(float(p50), 1),
+        "p95": round(float(p95), 1),
+        "p99": round(float(p99), 1),
+        "max": round(float(np.max(values)), 1),
+    }
+
+
+async def start_fake_providers(config: FakeProviderConfig, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(create_app(config), host="127.0.0.1", port=port, log_level="warning"))
+    asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    return server
+
+
+def start_app(port: int, fake_base: str, extra_env: Dict[str, str]) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "VOYAGE_API_URL": f"{fake_base}/v1/embeddings",
+        "MISTRAL_API_URL": f"{fake_base}/v1/embeddings",
+        "LLM_API_BASE": f"{fake_base}/v1",
+        "VOYAGE_API_KEY": "load-test",
+        "MISTRAL_API_KEY": "load-test",
+        "GEMINI_API_KEY": "load-test",
+        "GROQ_API_KEY": "load-test",
+        # Embeddings factices : scores non comparables au seuil de prod, on garde tout le top-k
+        "RETRIEVAL_SCORE_THRESHOLD": "-1",
+        "LOG_LEVEL": "WARNING",
+        **extra_env,
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+
+
+async def wait_until_healthy(client: httpx.AsyncClient, base_url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = await client.get(f"{base_url}/api/health")
+            if response.status_code == 200 and response.json().get("status") == "healthy":
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"API not healthy after {timeout}s ({base_url})")
+
+
+async def visitor(client: httpx.AsyncClient, base_url: str, questions: int, samples: List[Dict]) -> None:
+    """Un visiteur : une session, quelques questions à la suite."""
+    session_id = str(uuid.uuid4())
+    for _ in range(questions):
+        start = time.perf_counter()
+        sample = {"status": None}
+        try:
+            response = await client.post(
+                f"{base_url}/api/chat/",
+                json={"message": random.choice(QUESTIONS), "session_id": session_id},
+            )
+            sample["status"] = response.status_code
+            if response.status_code == 200:
+                body = response.json()
+                sample.update({
+                    "provider_used": body["provider_used"],
+                    "cached": body.get("cached", False),
+                    "timings": body.get("timings") or {},
+                })
+        except httpx.HTTPError as e:
+            sample["status"] = type(e).__name__
+        sample["latency_ms"] = (time.perf_counter() - start) * 1000
+        samples.append(sample)
+
+
+async def drive(base_url: str, total_requests: int, concurrency: int, questions_per_session: int) -> Dict:
+    samples: List[Dict] = []
+    sessions = max(1, total_requests // questions_per_session)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_visitor(client: httpx.AsyncClient):
+        async with semaphore:
+            await visitor(client, base_url, questions_per_session, samples)
+
+    async with httpx.AsyncClient(timeout=120.0, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[run_visitor(client) for _ in range(sessions)])
+        duration = time.perf_counter() - start
+
+    ok = [s for s in samples if s["status"] == 200]
+    return {
+        "duration_s": round(duration, 2),
+        "requests": len(samples),
+        "succeeded": len(ok),
+        "throughput_rps": round(len(ok) / duration, 2) if duration else 0.0,
+        "statuses": dict(Counter(str(s["status"]) for s in samples)),
+        "providers": dict(Counter(s["provider_used"] for s in ok)),
+        "cached": sum(1 for s in ok if s["cached"]),
+        "latency_ms": {
+            "end_to_end": percentiles([s["latency_ms"] for s in ok]),
+            **{
+                stage.removesuffix("_ms"): percentiles([s["timings"][stage] for s in ok if stage in s["timings"]])
+                for stage in STAGES
+            },
+        },
+    }
+
+
+def print_summary(report: Dict) -> None:
+    results = report["results"]
+    print(
+        f"\n{results['succeeded']}/{results['requests']} OK in {results['duration_s']}s "
+        f"→ {results['throughput_rps']} req/s | statuses {results['statuses']}"
+    )
+    print(f"{'stage':<12}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for stage, stats in results["latency_ms"].items():
+        if stats:
+            print(f"{stage:<12}{stats['p50']:>10}{stats['p95']:>10}{stats['p99']:>10}{stats['max']:>10}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    fake_config = FakeProviderConfig(
+        embedding_latency_ms=args.embedding_latency_ms,
+        embedding_error_rate=args.embedding_error_rate,
+        llm_latency_ms=args.llm_latency_ms,
+        llm_error_rate=args.llm_error_rate,
+        llm_latency_by_model=parse_key_values(args.llm_latency, float),
+    )
+    fake_base = f"http://127.0.0.1:{args.fake_port}"
+    base_url = f"http://127.0.0.1:{args.app_port}"
+
+    fake_server = await start_fake_providers(fake_config, args.fake_port)
+    app_process = start_app(args.app_port, fake_base, parse_key_values(args.app_env))
+    try:
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            await wait_until_healthy(client, base_url)
+
+        if args.warmup:
+            await drive(base_url, args.warmup, min(args.concurrency, args.warmup), 1)
+
+        results = await drive(base_url, args.requests, args.concurrency, args.questions_per_session)
+
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            fake_stats = (await client.get(f"{fake_base}/stats")).json()
+    finally:
+        app_process.terminate()
+        app_process.wait(timeout=30)
+        fake_server.should_exit = True
+
+    report = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "label": args.label,
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "questions_per_session": args.questions_per_session,
+            "warmup": args.warmup,
+            "fake_providers": vars(fake_config),
+            "app_env": parse_key_values(args.app_env),
+        },
+        "results": results,
+        "fake_providers": fake_stats,
+    }
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"load_{datetime.now():%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+
+    print_summary(report)
+    print(f"\n📄 Report written to {output}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load test /api/chat against fake providers")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--questions-per-session", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=10, help="Requêtes ignorées avant la mesure")
+    parser.add_argument("--embedding-latency-ms", type=float, default=80.0)
+    parser.add_argument("--embedding-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=1200.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-latency", action="append", default=[], metavar="MODEL=MS",
+                        help="Latence moyenne d'un modèle, ex. gemini/gemini-2.5-flash=4000")
+    parser.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Variable d'environnement de l'API, ex. ANSWER_CACHE_ENABLED=false")
+    parser.add_argument("--fake-port", type=int, default=8765)
+    parser.add_argument("--app-port", type=int, default=8100)
+    parser.add_argument("--label", default="", help="Libellé du run (rapport)")
+    parser.add_argument("--output", help="Fichier JSON (défaut : tests/load/results/load_<date>.json)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,34 @@
+"""
+Tests de la négociation du format des pages du CV (en-tête Accept).
+
+Usage (depuis backend/) :
+    python -m pytest tests/test_cv_negotiation.py
+"""
+import pytest
+from starlette.requests import Request
+
+from app.routers.cv import accepted_image_formats
+
+
+def formats(accept: str):
+    return accepted_image_formats(Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/api/cv/page/1",
+        "headers": [(b"accept", accept.encode())],
+    }))
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("image/avif,image/webp,image/apng,image/*,*/*;q=0.8", ["avif", "webp"]),
+    ("image/webp,*/*", ["webp"]),
+    ("image/avif;q=0,image/webp", ["webp"]),
+    ("image/avif; q=0.0, image/webp;q=0", []),
+    ("image/avif;q=0.5,image/webp;q=0.9", ["webp", "avif"]),
+    ("IMAGE/AVIF", ["avif"]),
+    ("image/avif;q=abc", []),
+    ("image/*,*/*", []),
+    ("", []),
+])
+def test_accepted_image_formats(accept, expected):
+    assert formats(accept) == expected
@@ -0,0 +1,79 @@
+"""
+Tests du parseur d'en-tête Range de /api/cv (requested_range).
+
+Usage (depuis backend/) :
+    python -m pytest tests/test_cv_range.py
+"""
+from typing import Dict
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.routers.cv import requested_range
+
+SIZE = 1000
+ETAG = '"abc123"'
+
+
+def make_request(headers: Dict[str, str]) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/api/cv/view",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+    })
+
+
+def parse(range_header: str, **headers: str):
+    return requested_range(make_request({"Range": range_header, **headers}), SIZE, ETAG)
+
+
+def test_no_range_header_serves_full_asset():
+    assert requested_range(make_request({}), SIZE, ETAG) is None
+
+
+def test_closed_range():
+    assert parse("bytes=0-99") == (0, 99)
+    assert parse("bytes=500-500") == (500, 500)
+
+
+def test_closed_range_clamped_to_asset_end():
+    assert parse("bytes=900-5000") == (900, 999)
+
+
+def test_open_ended_range():
+    assert parse("bytes=100-") == (100, 999)
+
+
+def test_suffix_range():
+    assert parse("bytes=-100") == (900, 999)
+
+
+def test_suffix_longer_than_asset_serves_everything():
+    assert parse("bytes=-5000") == (0, 999)
+
+
+def test_multiple_ranges_serve_full_asset():
+    assert parse("bytes=0-9,20-29") is None
+
+
+@pytest.mark.parametrize("header", ["bytes=5-3", "bytes=abc", "bytes=-", "bytes=1-2-3", "items=0-9", "bytes=+1-2"])
+def test_invalid_range_spec_is_ignored(header):
+    assert parse(header) is None
+
+
+def test_stale_if_range_serves_full_asset():
+    assert parse("bytes=0-99", **{"If-Range": '"old-etag"'}) is None
+
+
+def test_matching_if_range_keeps_range():
+    assert parse("bytes=0-99", **{"If-Range": ETAG}) == (0, 99)
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=1000-1200", "bytes=-0"])
+def test_unsatisfiable_range_is_416(header):
+    with pytest.raises(HTTPException) as error:
+        parse(header)
+    assert error.value.status_code == 416
+    assert error.value.headers["Content-Range"] == f"bytes */{SIZE}"
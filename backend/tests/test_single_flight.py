@@ -0,0 +1,84 @@
+"""
+Tests de SingleFlight : mutualisation et annulation quand plus personne n'attend.
+
+Usage (depuis backend/) :
+    python -m pytest tests/test_single_flight.py
+"""
+import asyncio
+
+from app.core.single_flight import SingleFlight
+
+
+class SlowCall:
+    """fn() de test : bloque jusqu'à release(), compte ses exécutions et annulations."""
+
+    def __init__(self):
+        self.calls = 0
+        self.cancelled = False
+        self.released = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await self.released.wait()
+            return "answer"
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        flights, call = SingleFlight(), SlowCall()
+        first = asyncio.create_task(flights.do("q", call))
+        second = asyncio.create_task(flights.do("q", call))
+        await asyncio.sleep(0)
+        call.released.set()
+        assert await first == ("answer", False)
+        assert await second == ("answer", True)
+        assert call.calls == 1
+        assert flights.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelling_one_waiter_keeps_the_call_running():
+    async def scenario():
+        flights, call = SingleFlight(), SlowCall()
+        leader = asyncio.create_task(flights.do("q", call))
+        follower = asyncio.create_task(flights.do("q", call))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        await asyncio.sleep(0)
+        assert not call.cancelled
+
+        call.released.set()
+        assert await follower == ("answer", True)
+        assert flights.stats()["cancelled"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelling_every_waiter_cancels_the_call():
+    async def scenario():
+        flights, call = SingleFlight(), SlowCall()
+        waiters = [asyncio.create_task(flights.do("q", call)) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+
+        assert call.cancelled
+        assert flights.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 1, "cancelled": 1}
+
+        # Un nouvel appelant relance le travail au lieu d'hériter de la tâche annulée
+        retry = asyncio.create_task(flights.do("q", call))
+        await asyncio.sleep(0)
+        call.released.set()
+        assert await retry == ("answer", False)
+        assert call.calls == 2
+
+    asyncio.run(scenario())
@@ -7,11 +7,15 @@ import Image from 'next/image';
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
 const TOTAL_PAGES = 2;
+// Largeurs des variantes WebP/AVIF générées par upload_cv_pdf.py (format négocié via Accept)
+const PAGE_WIDTHS = [480, 960, 1440, 1920];
+const CONTAINER_MAX_WIDTH = 1088;
 
 export default function CVPage() {
   const pdfUrl = getPdfUrl();
   const [currentPage, setCurrentPage] = useState(1);
   const [zoom, setZoom] = useState(100);
+  const pageUrl = (width: number) => `${API_URL}/api/cv/page/${currentPage}?w=${width}`;
 
   return (
     <div className="container mx-auto px-4 py-8 max-w-6xl">
@@ -79,7 +83,9 @@ export default function CVPage() {
       <div className="bg-white rounded-lg shadow-sm border border-gray-200 p-8 flex justify-center overflow-auto">
         <div style={{ width: `${zoom}%`, transition: 'width 0.2s ease' }}>
           <img
-            src={`${API_URL}/api/cv/page/${currentPage}`}
+            src={pageUrl(1440)}
+            srcSet={PAGE_WIDTHS.map((width) => `${pageUrl(width)} ${width}w`).join(', ')}
+            sizes={`(max-width: ${CONTAINER_MAX_WIDTH}px) ${zoom}vw, ${Math.round((CONTAINER_MAX_WIDTH * zoom) / 100)}px`}
             alt={`CV Page ${currentPage}`}
             className="w-full h-auto shadow-lg"
             loading="eager"
@@ -21,6 +21,8 @@ export interface ChatResponse {
   provider_used: string;
   questions_count: number;
   questions_remaining: number;
+  cached?: boolean;
+  timings?: Record<string, number>;
 }
 
 export interface Session {